@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+        from .road_graph import RoadGraph
+
+        # Without a saved graph there is nothing cheap to preload, so leave
+        # the geospatial stack to the first pharmacy request.
+        graph_path = getattr(settings, 'ROAD_GRAPH_PATH', None)
+        if getattr(settings, 'ROUTING_PRELOAD', True) and graph_path and RoadGraph.exists(graph_path):
+            from . import pharmacy_routing
+            pharmacy_routing.load_road_graph()
+            pharmacy_routing.get_contraction_hierarchy()
+            pharmacy_routing.get_nearest_pharmacy_table()
@@ -0,0 +1,72 @@
+import json
+import platform
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# --- Shared helpers for the bench_* management commands ---
+# Reports are plain JSON so runs can be diffed or plotted over time.
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Nearest-rank percentiles plus min/max/mean, in the units given."""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    n = len(ordered)
+    summary = {'count': n, 'min': ordered[0], 'max': ordered[-1], 'mean': sum(ordered) / n}
+    for p in points:
+        rank = max(1, -(-p * n // 100))
+        summary[f'p{p}'] = ordered[rank - 1]
+    return summary
+
+
+def scaled(summary, factor, digits=3):
+    # e.g. seconds -> milliseconds, leaving the count alone.
+    return {
+        key: value if key == 'count' else round(value * factor, digits)
+        for key, value in summary.items()
+    }
+
+
+def report_header(name, config):
+    return {
+        'benchmark': name,
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'config': config,
+    }
+
+
+def write_report(report, output=None):
+    """Write the report to `output` (a path) and return it as a JSON string."""
+    text = json.dumps(report, indent=2, sort_keys=False, default=str)
+    if output:
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text + '\n')
+    return text
+
+
+
+class Stopwatch:
+    """Wall-time samples per named phase."""
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, phase, seconds):
+        self.samples.setdefault(phase, []).append(seconds)
+
+    def time(self, phase, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.record(phase, time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        return {
+            phase: dict(scaled(percentiles(samples), 1000), total=round(sum(samples) * 1000, 3))
+            for phase, samples in self.samples.items()
+        }
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+
+
+class CoalescingScheduler:
+    """Merges bursts of queue changes into one broadcast per key.
+
+    The first change for a key arms a `window`-second timer on the running
+    event loop; further changes inside the window ride along with it. The
+    pending entry is cleared *before* `send` reads the queue, so a change that
+    lands while a broadcast is going out schedules another one and the final
+    state always goes out.
+
+    `send` is a coroutine function and runs on the loop that scheduled it,
+    which under ASGI is the server's: that is the loop the consumers wait on,
+    and the one channels_redis keeps its connections for.
+    """
+
+    def __init__(self, send, window):
+        self.send = send
+        self.window = window
+        self._timers = {}  # key -> (loop, TimerHandle)
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self.requested = 0
+        self.sent = 0
+
+    async def schedule(self, key):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.requested += 1
+            timer = self._timers.get(key)
+            # A timer armed on a loop that has since closed will never fire.
+            if timer is not None and not timer[0].is_closed():
+                return
+            self._timers[key] = (loop, loop.call_later(self.window, self._fire, key))
+
+    def _fire(self, key):
+        with self._lock:
+            if self._timers.pop(key, None) is None:
+                return
+            self.sent += 1
+        task = asyncio.ensure_future(self.send(key))
+        # The loop only keeps weak references to tasks.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        with self._lock:
+            pending = list(self._timers.items())
+            self._timers.clear()
+            self.sent += len(pending)
+        for key, (_, handle) in pending:
+            handle.cancel()
+            await self.send(key)
+
+    def pending(self):
+        with self._lock:
+            return sorted(self._timers)
@@ -1,11 +1,18 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
-from asgiref.sync import sync_to_async
-from .queue_manager import get_queue_position, get_queue_count
+from .queue_manager import aget_queue_status
+from . import metrics
+
+# Upper bound on session keys in one get_positions request.
+MAX_BATCH_SESSION_KEYS = 500
+# Metric label for actions; anything else a client sends counts as 'unknown'.
+ACTIONS = ('get_position', 'get_positions')
 
 class QueueConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.specialty = self.scope['url_route']['kwargs']['specialty']
+        session = self.scope.get('session')
+        self.session_key = session.session_key if session is not None else None
         self.room_group_name = f'queue_{self.specialty.replace(" ", "_")}'
 
         await self.channel_layer.group_add(
@@ -14,8 +21,10 @@ class QueueConsumer(AsyncWebsocketConsumer):
         )
 
         await self.accept()
+        metrics.increment('ws.connections', event='connect')
 
     async def disconnect(self, close_code):
+        metrics.increment('ws.connections', event='disconnect')
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
@@ -24,26 +33,61 @@ class QueueConsumer(AsyncWebsocketConsumer):
     async def receive(self, text_data):
         data = json.loads(text_data)
         action = data.get('action')
-        
+        with metrics.timed('ws.receive', action=action if action in ACTIONS else 'unknown'):
+            await self.handle_action(action, data)
+
+    async def handle_action(self, action, data):
         if action == 'get_position':
             session_key = data.get('session_key')
             queue_number = data.get('queue_number')
+            if session_key:
+                self.session_key = session_key
             
-            position = await sync_to_async(get_queue_position)(self.specialty, session_key)
-            total = await sync_to_async(get_queue_count)(self.specialty)
-            
+            positions, total = await aget_queue_status(self.specialty, [session_key])
+
             await self.send(text_data=json.dumps({
                 'type': 'position_update',
-                'position': position,
+                'position': positions[session_key],
                 'total': total,
                 'queue_number': queue_number
             }))
 
+        elif action == 'get_positions':
+            session_keys = data.get('session_keys')
+            if not isinstance(session_keys, list):
+                await self.send(text_data=json.dumps({'type': 'error', 'error': 'session_keys must be a list'}))
+                return
+            session_keys = [key for key in session_keys if isinstance(key, str)][:MAX_BATCH_SESSION_KEYS]
+            positions, total = await aget_queue_status(self.specialty, session_keys)
+
+            await self.send(text_data=json.dumps({
+                'type': 'positions_update',
+                'positions': positions,
+                'total': total
+            }))
+
     async def queue_update(self, event):
-        await self.send(text_data=json.dumps({
-            'type': 'queue_update',
-            'position': event.get('position'),
-            'total': event.get('total'),
-            'queue_number': event.get('queue_number'),
-            'session_key': event.get('session_key')
-        }))
+        metrics.increment('ws.queue_updates')
+        queue = event.get('queue')
+        if queue is None:
+            await self.send(text_data=json.dumps({
+                'type': 'queue_update',
+                'position': event.get('position'),
+                'total': event.get('total'),
+                'queue_number': event.get('queue_number'),
+                'session_key': event.get('session_key')
+            }))
+            return
+
+        # Snapshot broadcast: one message per socket carrying only its own entry.
+        message = {'type': 'queue_update', 'total': event.get('total')}
+        if self.session_key:
+            for idx, (session_key, queue_number) in enumerate(queue):
+                if session_key == self.session_key:
+                    message.update({
+                        'position': idx + 1,
+                        'queue_number': queue_number,
+                        'session_key': self.session_key
+                    })
+                    break
+        await self.send(text_data=json.dumps(message))
@@ -0,0 +1,281 @@
+import heapq
+import math
+import random
+
+import numpy as np
+
+from .road_graph import array_store_exists, load_arrays, read_meta, save_arrays
+
+ARRAYS = (
+    'node_ids', 'rank',
+    'up_indptr', 'up_indices', 'up_weights',
+    'down_indptr', 'down_indices', 'down_weights',
+)
+WITNESS_SETTLE_LIMIT = 60
+
+
+def _witness_search(out_adj, source, excluded, max_cost, settle_limit):
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        if d > max_cost or settled >= settle_limit:
+            break
+        settled += 1
+        for x, w in out_adj[u].items():
+            if x == excluded:
+                continue
+            nd = d + w
+            if nd < dist.get(x, math.inf):
+                dist[x] = nd
+                heapq.heappush(heap, (nd, x))
+    return dist
+
+
+def _shortcuts(out_adj, in_adj, v, settle_limit):
+    shortcuts = []
+    outgoing = out_adj[v]
+    if not outgoing:
+        return shortcuts
+    max_out = max(outgoing.values())
+    for u, w_in in in_adj[v].items():
+        witness = _witness_search(out_adj, u, v, w_in + max_out, settle_limit)
+        for x, w_out in outgoing.items():
+            if x == u:
+                continue
+            cost = w_in + w_out
+            if witness.get(x, math.inf) > cost:
+                shortcuts.append((u, x, cost))
+    return shortcuts
+
+
+def _to_csr(n, adjacency):
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum([len(adjacency[u]) for u in range(n)], out=indptr[1:])
+    indices = np.fromiter((v for u in range(n) for v in adjacency[u]), dtype=np.int32, count=int(indptr[-1]))
+    weights = np.fromiter((w for u in range(n) for w in adjacency[u].values()), dtype=np.float64, count=int(indptr[-1]))
+    return indptr, indices, weights
+
+
+def _iter_upward_search(indptr, indices, weights, source):
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = set()
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        yield u, d
+        start, end = int(indptr[u]), int(indptr[u + 1])
+        for v, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+
+class TargetBuckets:
+    """Backward CH search spaces of a fixed target set, grouped by meeting node."""
+
+    def __init__(self, buckets, size):
+        self.buckets = buckets
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+
+class ContractionHierarchy:
+    """Contraction hierarchy over a RoadGraph.
+
+    Nodes are contracted one by one in order of importance; shortcuts keep
+    distances intact among the remaining nodes. Queries then only search
+    "upward" (towards higher-ranked nodes) from both ends, which touches a
+    few hundred nodes instead of the whole city.
+
+    `up_*` holds the forward upward graph, `down_*` the reversed downward
+    graph used for the backward search, both as CSR arrays over node indices.
+    """
+
+    def __init__(self, node_ids, rank, up_indptr, up_indices, up_weights,
+                 down_indptr, down_indices, down_weights, graph=None):
+        self.node_ids = node_ids
+        # RoadGraph.fingerprint() of the graph this was contracted from.
+        self.graph = graph
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_indices = up_indices
+        self.up_weights = up_weights
+        self.down_indptr = down_indptr
+        self.down_indices = down_indices
+        self.down_weights = down_weights
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @classmethod
+    def build(cls, road_graph, settle_limit=WITNESS_SETTLE_LIMIT):
+        n = len(road_graph)
+        out_adj = [dict() for _ in range(n)]
+        in_adj = [dict() for _ in range(n)]
+        indptr = road_graph.indptr.tolist()
+        indices = road_graph.indices.tolist()
+        lengths = road_graph.lengths.tolist()
+        for u in range(n):
+            for e in range(indptr[u], indptr[u + 1]):
+                v, w = indices[e], lengths[e]
+                if u != v and w < out_adj[u].get(v, math.inf):
+                    out_adj[u][v] = w
+                    in_adj[v][u] = w
+
+        deleted_neighbors = [0] * n
+
+        def priority(v):
+            added = len(_shortcuts(out_adj, in_adj, v, settle_limit))
+            removed = len(out_adj[v]) + len(in_adj[v])
+            return added - removed + deleted_neighbors[v]
+
+        heap = [(priority(v), v) for v in range(n)]
+        heapq.heapify(heap)
+
+        rank = np.zeros(n, dtype=np.int32)
+        up = [None] * n
+        down = [None] * n
+        next_rank = 0
+        contracted = [False] * n
+
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            # Lazy update: re-evaluate and push back if v is no longer the cheapest.
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+
+            for u, x, cost in _shortcuts(out_adj, in_adj, v, settle_limit):
+                if cost < out_adj[u].get(x, math.inf):
+                    out_adj[u][x] = cost
+                    in_adj[x][u] = cost
+
+            contracted[v] = True
+            rank[v] = next_rank
+            next_rank += 1
+            up[v] = out_adj[v]
+            down[v] = in_adj[v]
+            for x in out_adj[v]:
+                del in_adj[x][v]
+                deleted_neighbors[x] += 1
+            for u in in_adj[v]:
+                del out_adj[u][v]
+                deleted_neighbors[u] += 1
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+        up_indptr, up_indices, up_weights = _to_csr(n, up)
+        down_indptr, down_indices, down_weights = _to_csr(n, down)
+        return cls(np.asarray(road_graph.node_ids), rank, up_indptr, up_indices, up_weights,
+                   down_indptr, down_indices, down_weights, graph=road_graph.fingerprint())
+
+    @staticmethod
+    def exists(path):
+        return array_store_exists(path)
+
+    def save(self, path):
+        save_arrays(path, {name: getattr(self, name) for name in ARRAYS}, {
+            'nodes': len(self),
+            'shortcut_edges': len(self.up_indices) + len(self.down_indices),
+            'graph': self.graph,
+        })
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(**load_arrays(path, ARRAYS, mmap), graph=read_meta(path).get('graph'))
+
+    def index_of(self, node_id):
+        idx = int(np.searchsorted(self.node_ids, node_id))
+        if idx >= len(self.node_ids) or self.node_ids[idx] != node_id:
+            raise KeyError(node_id)
+        return idx
+
+    def forward_search(self, source):
+        return _iter_upward_search(self.up_indptr, self.up_indices, self.up_weights, self.index_of(source))
+
+    def backward_search(self, target):
+        return _iter_upward_search(self.down_indptr, self.down_indices, self.down_weights, self.index_of(target))
+
+    def distance(self, source, target):
+        forward = dict(self.forward_search(source))
+        backward = dict(self.backward_search(target))
+        return min((d + backward[u] for u, d in forward.items() if u in backward), default=math.inf)
+
+    def target_buckets(self, targets):
+        buckets = {}
+        size = 0
+        for target in targets:
+            for u, d in self.backward_search(target):
+                buckets.setdefault(u, []).append((target, d))
+            size += 1
+        for bucket in buckets.values():
+            bucket.sort(key=lambda entry: entry[1])
+        return TargetBuckets(buckets, size)
+
+    def one_to_many(self, source, target_buckets, k=None):
+        """Distances from `source` to reachable targets, as {node_id: metres}.
+
+        With `k`, only the k nearest targets are guaranteed to be present and
+        exact: the forward search stops once it can no longer improve them.
+        """
+        best = {}
+        bound = math.inf
+        buckets = target_buckets.buckets
+        for u, du in self.forward_search(source):
+            if du >= bound:
+                break
+            bucket = buckets.get(u)
+            if not bucket:
+                continue
+            for target, dt in bucket:
+                d = du + dt
+                if d >= bound:
+                    break
+                if d < best.get(target, math.inf):
+                    best[target] = d
+            if k is not None and len(best) >= k:
+                bound = heapq.nsmallest(k, best.values())[-1]
+        return best
+
+    def nearest_targets(self, source, target_buckets, k):
+        best = self.one_to_many(source, target_buckets, k)
+        return sorted(best.items(), key=lambda item: item[1])[:k]
+
+
+def cross_check(ch, G, samples=100, targets_per_source=5, seed=0, tolerance=1e-6):
+    """Compare CH distances with nx.dijkstra_path_length on random node pairs.
+
+    Returns a list of (source, target, ch_distance, dijkstra_distance) for
+    every pair that disagrees; an empty list means the hierarchy checks out.
+    """
+    import networkx as nx
+
+    rng = random.Random(seed)
+    nodes = list(G.nodes)
+    mismatches = []
+    for _ in range(samples):
+        source = rng.choice(nodes)
+        targets = rng.sample(nodes, min(targets_per_source, len(nodes)))
+        found = ch.one_to_many(source, ch.target_buckets(targets))
+        for target in targets:
+            try:
+                expected = nx.dijkstra_path_length(G, source, target, weight='length')
+            except nx.NetworkXNoPath:
+                expected = math.inf
+            actual = found.get(target, math.inf)
+            if not (actual == expected or abs(actual - expected) <= tolerance * max(1.0, expected)):
+                mismatches.append((source, target, actual, expected))
+    return mismatches
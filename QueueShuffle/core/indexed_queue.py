@@ -0,0 +1,136 @@
+class FenwickTree:
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, i, delta):
+        i += 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, i):
+        # Sum of slots [0, i]
+        i += 1
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def find_kth(self, k):
+        # Smallest slot whose prefix sum reaches k (k >= 1)
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] < k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+
+class IndexedQueue:
+    """FIFO of unique keys with O(log n) position lookups.
+
+    Each key gets a slot (sequence number) on append. A Fenwick tree over the
+    slots counts live entries, so a key's 1-based position is the prefix sum
+    at its slot. Removed slots are left empty and reclaimed by an occasional
+    rebuild, which keeps append/popleft amortised O(log n).
+
+    Behaves like the deque it replaces for append, popleft, len, `in` and
+    iteration.
+    """
+
+    MIN_CAPACITY = 64
+
+    def __init__(self, iterable=()):
+        self._rebuild(list(iterable))
+
+    def _rebuild(self, keys, capacity=None):
+        capacity = max(capacity or 2 * len(keys), self.MIN_CAPACITY)
+        self._slots = keys + [None] * (capacity - len(keys))
+        self._slot_of = {key: i for i, key in enumerate(keys)}
+        self._head = 0
+        self._tail = len(keys)
+        self._tree = FenwickTree(capacity)
+        # Build the tree in O(n) instead of n separate adds.
+        tree = self._tree.tree
+        for i in range(1, len(keys) + 1):
+            tree[i] = 1
+        for i in range(1, capacity + 1):
+            parent = i + (i & -i)
+            if parent <= capacity:
+                tree[parent] += tree[i]
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __bool__(self):
+        return bool(self._slot_of)
+
+    def __contains__(self, key):
+        return key in self._slot_of
+
+    def __iter__(self):
+        slots = self._slots
+        for i in range(self._head, self._tail):
+            key = slots[i]
+            if key is not None:
+                yield key
+
+    def __repr__(self):
+        return f"IndexedQueue({list(self)!r})"
+
+    def append(self, key):
+        if key in self._slot_of:
+            raise ValueError(f"{key!r} is already queued")
+        if self._tail == len(self._slots):
+            self._rebuild(list(self))
+        slot = self._tail
+        self._slots[slot] = key
+        self._slot_of[key] = slot
+        self._tree.add(slot, 1)
+        self._tail += 1
+
+    def popleft(self):
+        if not self._slot_of:
+            raise IndexError('pop from an empty queue')
+        slot = self._tree.find_kth(1)
+        key = self._slots[slot]
+        self._head = slot + 1
+        self._clear_slot(key, slot)
+        return key
+
+    def remove(self, key):
+        slot = self._slot_of.get(key)
+        if slot is None:
+            raise ValueError(f"{key!r} is not in the queue")
+        self._clear_slot(key, slot)
+
+    def _clear_slot(self, key, slot):
+        self._slots[slot] = None
+        del self._slot_of[key]
+        self._tree.add(slot, -1)
+        # Reclaim space once most of the used slots are dead.
+        used = self._tail - self._head
+        if used > self.MIN_CAPACITY and len(self._slot_of) < used // 4:
+            self._rebuild(list(self))
+
+    def index(self, key):
+        """0-based position of `key`, like list.index."""
+        slot = self._slot_of.get(key)
+        if slot is None:
+            raise ValueError(f"{key!r} is not in the queue")
+        return self._tree.prefix_sum(slot) - 1
+
+    def position(self, key):
+        """1-based position of `key`, or -1 if it is not queued."""
+        slot = self._slot_of.get(key)
+        if slot is None:
+            return -1
+        return self._tree.prefix_sum(slot)
+
+    def peek(self):
+        return self._slots[self._tree.find_kth(1)] if self._slot_of else None
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from core import queue_manager, views
+from core.bench import percentiles, report_header, scaled, write_report
+from core.broadcasting import CoalescingScheduler
+from core.routing import websocket_urlpatterns
+
+# Patients and doctors are in-process WebsocketCommunicators talking to the
+# real QueueConsumer through the chosen channel layer. Every join or accept
+# goes through queue_manager and views.schedule_queue_update from a sync
+# thread, as the views do, so broadcasts are coalesced over --window-ms. Each
+# socket timestamps the updates it receives. Within a phase the queue length
+# after each change is unique, so the `total` in an update identifies the
+# change it shows: `latency_ms` is measured from that change, `delivery_ms`
+# from every change to the first update a socket got that includes it.
+
+LAYER_CAPACITY = 100_000
+
+
+def channel_layer_config(layer, redis_url):
+    if layer == 'redis':
+        return {'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [redis_url], 'capacity': LAYER_CAPACITY},
+        }}
+    return {'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'CONFIG': {'capacity': LAYER_CAPACITY},
+    }}
+
+
+class Socket:
+    def __init__(self, specialty, session_key=None):
+        self.specialty = specialty
+        self.session_key = session_key
+        self.communicator = WebsocketCommunicator(
+            URLRouter(websocket_urlpatterns), f'/ws/queue/{specialty}/'
+        )
+        self.received = []  # (arrival time, total)
+        self.reader = None
+
+    async def connect(self):
+        connected, _ = await self.communicator.connect()
+        if not connected:
+            raise RuntimeError(f'Could not connect to /ws/queue/{self.specialty}/')
+        if self.session_key:
+            # Registers the session on the consumer, like the status page does.
+            await self.communicator.send_json_to({'action': 'get_position', 'session_key': self.session_key})
+            await self.communicator.receive_json_from()
+
+    def start_reading(self):
+        self.reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        queue = self.communicator.output_queue
+        while True:
+            message = await queue.get()
+            if message.get('type') == 'websocket.send':
+                total = json.loads(message['text']).get('total')
+                self.received.append((time.perf_counter(), total))
+
+    async def close(self):
+        if self.reader:
+            self.reader.cancel()
+        await self.communicator.disconnect()
+
+
+class Command(BaseCommand):
+    help = 'Load-test QueueConsumer and queue broadcasts with simulated patient and doctor sockets.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--patients', type=int, default=300, help='Patient sockets in total, spread over the specialties.')
+        parser.add_argument('--doctors', type=int, default=1, help='Doctor sockets per specialty.')
+        parser.add_argument('--accepts', type=int, default=None, help='Patients each specialty accepts (default: all).')
+        parser.add_argument('--layer', choices=['memory', 'redis'], default='memory')
+        parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/0')
+        parser.add_argument('--mode', choices=['snapshot', 'per_patient'], default=views.QUEUE_BROADCAST_MODE)
+        parser.add_argument('--window-ms', type=float, default=views.QUEUE_BROADCAST_WINDOW * 1000,
+                            help='Coalescing window for broadcasts (0 sends every change).')
+        parser.add_argument('--drain-timeout', type=float, default=30.0)
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        config = {key: options[key] for key in ('patients', 'doctors', 'accepts', 'layer', 'mode', 'window_ms')}
+        with override_settings(CHANNEL_LAYERS=channel_layer_config(options['layer'], options['redis_url'])):
+            channel_layers.backends.clear()
+            saved = views.QUEUE_BROADCAST_MODE, views.QUEUE_BROADCAST_WINDOW, views.QUEUE_BROADCAST_SCHEDULER
+            views.QUEUE_BROADCAST_MODE = options['mode']
+            views.QUEUE_BROADCAST_WINDOW = options['window_ms'] / 1000
+            views.QUEUE_BROADCAST_SCHEDULER = CoalescingScheduler(views.abroadcast_queue_update, views.QUEUE_BROADCAST_WINDOW)
+            try:
+                report = asyncio.run(self.run(options))
+            finally:
+                views.QUEUE_BROADCAST_MODE, views.QUEUE_BROADCAST_WINDOW, views.QUEUE_BROADCAST_SCHEDULER = saved
+                channel_layers.backends.clear()
+                queue_manager.reset_queues()
+
+        report = dict(report_header('queue', config), **report)
+        text = write_report(report, options['output'])
+        self.stdout.write(text)
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Saved report to {options['output']}"))
+
+    async def run(self, options):
+        await sync_to_async(queue_manager.reset_queues)()
+        specialties = queue_manager.get_specialties()
+        patients = [
+            Socket(specialties[i % len(specialties)], f'bench-patient-{i}')
+            for i in range(options['patients'])
+        ]
+        doctors = [Socket(specialty) for specialty in specialties for _ in range(options['doctors'])]
+        sockets = patients + doctors
+
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for socket in sockets:
+            await socket.connect()
+        connected_bytes = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        for socket in sockets:
+            socket.start_reading()
+
+        try:
+            join = await self.run_phase('join', sockets, options, self.join_workload(patients))
+            accepts = options['accepts']
+            accept = await self.run_phase('accept', sockets, options, self.accept_workload(specialties, options['doctors'], accepts))
+        finally:
+            for socket in sockets:
+                await socket.close()
+
+        return {
+            'connections': len(sockets),
+            'memory_per_connection_bytes': round(connected_bytes / max(len(sockets), 1)),
+            'phases': {'join': join, 'accept': accept},
+        }
+
+    def join_workload(self, patients):
+        async def workload(changed):
+            for patient in patients:
+                await queue_manager.aadd_to_queue(patient.specialty, patient.session_key)
+                await self.broadcast(patient.specialty, changed)
+        return workload
+
+    def accept_workload(self, specialties, doctors_per_specialty, accepts):
+        async def doctor(specialty, changed, remaining):
+            while remaining[specialty] > 0:
+                remaining[specialty] -= 1
+                if await queue_manager.aremove_from_queue(specialty) is None:
+                    return
+                await self.broadcast(specialty, changed)
+
+        async def workload(changed):
+            remaining = {
+                specialty: queue_manager.get_queue_count(specialty) if accepts is None else accepts
+                for specialty in specialties
+            }
+            await asyncio.gather(*(
+                doctor(specialty, changed, remaining)
+                for specialty in specialties for _ in range(doctors_per_specialty)
+            ))
+        return workload
+
+    async def broadcast(self, specialty, changed):
+        # Keep the first time each queue length was reached; a later update
+        # showing that length is the delayed result of that change.
+        changed.setdefault((specialty, queue_manager.get_queue_count(specialty)), time.perf_counter())
+        await sync_to_async(views.schedule_queue_update)(specialty)
+
+    async def run_phase(self, name, sockets, options, workload):
+        for socket in sockets:
+            socket.received.clear()
+        changed = {}
+        broadcasts = views.QUEUE_BROADCAST_SCHEDULER.sent
+        start = time.perf_counter()
+        await workload(changed)
+        sent = time.perf_counter() - start
+
+        # Wait until every socket has seen its specialty's final state.
+        final = {specialty: queue_manager.get_queue_count(specialty) for specialty, _ in changed}
+        deadline = time.monotonic() + options['drain_timeout']
+        while time.monotonic() < deadline:
+            if all(s.received and s.received[-1][1] == final.get(s.specialty, s.received[-1][1]) for s in sockets):
+                break
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+
+        change_times = {}
+        for (specialty, _), changed_at in changed.items():
+            change_times.setdefault(specialty, []).append(changed_at)
+        latencies = []
+        deliveries = []
+        stale = 0
+        for socket in sockets:
+            shown = []  # (time of the change an update shows, arrival)
+            for arrived, total in socket.received:
+                changed_at = changed.get((socket.specialty, total))
+                if changed_at is None:
+                    stale += 1
+                else:
+                    latencies.append(arrived - changed_at)
+                    shown.append((changed_at, arrived))
+            # A coalesced update covers every change up to the one it shows.
+            i = 0
+            for changed_at in sorted(change_times.get(socket.specialty, ())):
+                while i < len(shown) and shown[i][0] < changed_at:
+                    i += 1
+                if i < len(shown):
+                    deliveries.append(shown[i][1] - changed_at)
+        messages = sum(len(socket.received) for socket in sockets)
+        incomplete = sum(1 for s in sockets if s.specialty in final and (not s.received or s.received[-1][1] != final[s.specialty]))
+
+        self.stderr.write(f"--- {name}: {len(changed)} changes, {messages} messages in {elapsed:.2f}s ---")
+        return {
+            'changes': len(changed),
+            'messages': messages,
+            'seconds': round(elapsed, 4),
+            'workload_seconds': round(sent, 4),
+            'messages_per_second': round(messages / elapsed, 1) if elapsed else None,
+            'broadcasts': views.QUEUE_BROADCAST_SCHEDULER.sent - broadcasts if views.QUEUE_BROADCAST_WINDOW > 0 else len(changed),
+            'messages_per_client': percentiles([len(socket.received) for socket in sockets]),
+            'latency_ms': scaled(percentiles(latencies), 1000),
+            'delivery_ms': scaled(percentiles(deliveries), 1000),
+            'unmatched_messages': stale,
+            'sockets_missing_final_state': incomplete,
+        }
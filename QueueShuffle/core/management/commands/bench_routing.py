@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import routing_bench
+from core.bench import report_header, write_report
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the pharmacy routing strategies offline on synthetic and cached graphs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int_list, default=[1000, 5000], help='Comma-separated node counts for synthetic graphs.')
+        parser.add_argument('--kinds', default='grid,geometric', help='Synthetic graph kinds: grid, geometric.')
+        parser.add_argument('--pharmacy-share', type=float, default=0.02, help='Pharmacies per road node on synthetic graphs.')
+        parser.add_argument('--cache-dir', default=str(settings.BASE_DIR / 'cache'))
+        parser.add_argument('--cached', type=int, default=2, help='Datasets to take from cached Overpass responses (0 to skip).')
+        parser.add_argument('--cached-grid-nodes', type=int, default=2000)
+        parser.add_argument('--strategies', default=','.join(routing_bench.STRATEGIES))
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--pairwise-queries', type=int, default=3, help='pairwise runs one search per pharmacy, so it gets fewer queries.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file.')
+
+    def handle(self, *args, **options):
+        strategies = tuple(s for s in options['strategies'].split(',') if s)
+        unknown = [s for s in strategies if s not in routing_bench.STRATEGIES]
+        if unknown:
+            raise CommandError(f"Unknown strategies: {', '.join(unknown)}")
+        kinds = [k for k in options['kinds'].split(',') if k]
+
+        datasets = list(routing_bench.synthetic_datasets(kinds, options['sizes'], options['pharmacy_share'], options['seed']))
+        if options['cached']:
+            datasets += routing_bench.cached_datasets(
+                options['cache_dir'], options['cached'], options['cached_grid_nodes'], options['seed']
+            )
+
+        results = {}
+        for name, source, G, gdf in datasets:
+            start_time = time.time()
+            result = routing_bench.benchmark_dataset(
+                G, gdf, options['queries'], strategies, pairwise_queries=options['pairwise_queries'], seed=options['seed']
+            )
+            results[name] = dict(source=source, **result)
+            self.stderr.write(f"--- {name}: {result['nodes']} nodes, {result['pharmacies']} pharmacies in {time.time() - start_time:.2f}s ---")
+
+        config = {key: options[key] for key in ('sizes', 'kinds', 'pharmacy_share', 'cached', 'queries', 'pairwise_queries', 'seed')}
+        config['strategies'] = list(strategies)
+        report = dict(report_header('routing', config), datasets=results)
+        self.stdout.write(write_report(report, options['output']))
+
+        mismatched = [
+            f'{name}/{strategy}'
+            for name, result in results.items()
+            for strategy, stats in result['strategies'].items()
+            if not stats['matches_reference']
+        ]
+        if mismatched:
+            raise CommandError(f"Top-5 results differ from the reference strategy: {', '.join(mismatched)}")
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Saved report to {options['output']}"))
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.contraction import WITNESS_SETTLE_LIMIT, ContractionHierarchy, cross_check
+from core.road_graph import RoadGraph
+
+
+class Command(BaseCommand):
+    help = 'Preprocess the saved road graph into a contraction hierarchy for fast distance queries.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--graph', default=str(settings.ROAD_GRAPH_PATH))
+        parser.add_argument('--output', default=str(settings.CONTRACTION_HIERARCHY_PATH))
+        parser.add_argument('--witness-limit', type=int, default=WITNESS_SETTLE_LIMIT)
+        parser.add_argument('--verify', type=int, default=0, metavar='N',
+                            help='Cross-check N random sources against nx.dijkstra_path_length.')
+
+    def handle(self, *args, **options):
+        if not RoadGraph.exists(options['graph']):
+            raise CommandError(f"No road graph at {options['graph']}; run build_road_graph first.")
+        graph = RoadGraph.load(options['graph'], mmap=False)
+
+        start_time = time.time()
+        ch = ContractionHierarchy.build(graph, settle_limit=options['witness_limit'])
+        shortcut_edges = len(ch.up_indices) + len(ch.down_indices)
+        self.stdout.write(
+            f"Contracted {len(ch)} nodes in {time.time() - start_time:.2f}s "
+            f"({shortcut_edges} CH edges from {graph.edge_count} road edges)"
+        )
+
+        if options['verify']:
+            mismatches = cross_check(ch, graph.to_networkx(), samples=options['verify'])
+            if mismatches:
+                for source, target, actual, expected in mismatches[:10]:
+                    self.stderr.write(f"  {source} -> {target}: ch={actual:.3f} dijkstra={expected:.3f}")
+                raise CommandError(f"{len(mismatches)} distances disagree with Dijkstra; not saving.")
+            self.stdout.write(f"Cross-check against Dijkstra passed for {options['verify']} sources.")
+
+        ch.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Saved contraction hierarchy to {options['output']}"))
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import pharmacy_routing
+from core.pharmacy_table import NearestPharmacyTable
+from core.road_graph import RoadGraph
+
+
+class Command(BaseCommand):
+    help = 'Precompute the k nearest pharmacies and their road distances for every road node.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', type=int, default=pharmacy_routing.PHARMACY_RESULT_LIMIT)
+        parser.add_argument('--output', default=str(settings.NEAREST_PHARMACY_TABLE_PATH))
+
+    def handle(self, *args, **options):
+        G = pharmacy_routing.get_graph()
+        pharmacy_index = pharmacy_routing.get_pharmacy_index(G)
+        road_graph = G if isinstance(G, RoadGraph) else RoadGraph.from_networkx(G)
+
+        start_time = time.time()
+        table = NearestPharmacyTable.build(road_graph, pharmacy_index, options['k'])
+        self.stdout.write(
+            f"Labelled {len(table.node_ids)} nodes with their {table.k} nearest of "
+            f"{len(table.pharmacy_nodes)} pharmacy nodes in {time.time() - start_time:.2f}s"
+        )
+
+        table.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Saved nearest-pharmacy table to {options['output']}"))
@@ -0,0 +1,31 @@
+import time
+
+import osmnx as ox
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.road_graph import RoadGraph
+from core.pharmacy_routing import GRAPH_PLACE
+
+
+class Command(BaseCommand):
+    help = 'Download the drive network and save it as a memory-mappable CSR road graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--place', default=GRAPH_PLACE)
+        parser.add_argument('--output', default=str(settings.ROAD_GRAPH_PATH))
+        parser.add_argument('--graphml', help='Build from a saved GraphML file instead of downloading.')
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        if options['graphml']:
+            G = ox.load_graphml(options['graphml'])
+        else:
+            G = ox.graph_from_place(options['place'], network_type='drive')
+        self.stdout.write(f"Loaded {len(G)} nodes / {G.number_of_edges()} edges in {time.time() - start_time:.2f}s")
+
+        graph = RoadGraph.from_networkx(G)
+        graph.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Saved {len(graph)} nodes / {graph.edge_count} edges to {options['output']}"
+        ))
@@ -0,0 +1,148 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+
+# --- In-process metrics ---
+# Counters and fixed-bucket histograms, kept per worker process. Every entry
+# point checks ENABLED first, so with metrics off an instrumented call costs
+# one global lookup and timed() hands back a shared no-op context manager.
+
+ENABLED = getattr(settings, 'METRICS_ENABLED', False)
+
+# Upper bounds in seconds for latencies and in items for sizes.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_NOOP = nullcontext()
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        running = 0
+        result = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+
+def increment(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    if not ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+
+class _Timer:
+    __slots__ = ('name', 'labels', 'start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def timed(name, **labels):
+    """Context manager recording the block's wall time in seconds."""
+    if not ENABLED:
+        return _NOOP
+    return _Timer(name, labels)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {
+            key: (h.count, h.sum, h.cumulative())
+            for key, h in _histograms.items()
+        }
+
+    result = {'pid': os.getpid(), 'enabled': ENABLED, 'counters': {}, 'histograms': {}}
+    for (name, labels), value in sorted(counters.items()):
+        result['counters'].setdefault(name, []).append({'labels': dict(labels), 'value': value})
+    for (name, labels), (count, total, buckets) in sorted(histograms.items()):
+        result['histograms'].setdefault(name, []).append({
+            'labels': dict(labels),
+            'count': count,
+            'sum': total,
+            'buckets': {str(bound): n for bound, n in buckets},
+        })
+    return result
+
+
+def _prometheus_labels(labels, **extra):
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+def prometheus_text(data=None):
+    """The snapshot in Prometheus text exposition format."""
+    data = data or snapshot()
+    lines = []
+    for name, series in data['counters'].items():
+        metric = name.replace('.', '_') + '_total'
+        lines.append(f'# TYPE {metric} counter')
+        for s in series:
+            lines.append(f"{metric}{_prometheus_labels(s['labels'], pid=data['pid'])} {s['value']}")
+    for name, series in data['histograms'].items():
+        metric = name.replace('.', '_')
+        lines.append(f'# TYPE {metric} histogram')
+        for s in series:
+            for bound, n in s['buckets'].items():
+                lines.append(f"{metric}_bucket{_prometheus_labels(s['labels'], pid=data['pid'], le=bound)} {n}")
+            labels = _prometheus_labels(s['labels'], pid=data['pid'])
+            lines.append(f"{metric}_count{labels} {s['count']}")
+            lines.append(f"{metric}_sum{labels} {s['sum']}")
+    return '\n'.join(lines) + '\n'
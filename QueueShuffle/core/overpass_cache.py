@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from hashlib import sha1
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+"""
+
+
+def cache_key(url):
+    # Same SHA-1 of the request URL that osmnx uses for its cache file names,
+    # so existing <digest>.json files import under the key osmnx will ask for.
+    return sha1(url.encode('utf-8')).hexdigest()
+
+
+class OverpassCacheStore:
+    """Single-file SQLite store for osmnx HTTP responses.
+
+    Bodies are zlib-compressed JSON, keyed like the osmnx file cache. When
+    `max_bytes` is set, the least recently read entries are evicted once the
+    stored bodies grow past it.
+    """
+
+    def __init__(self, path, max_bytes=None):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    def __contains__(self, key):
+        row = self._connect().execute('SELECT 1 FROM responses WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute('SELECT body FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with conn:
+            conn.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, key, response_json):
+        self._put_raw(key, json.dumps(response_json).encode('utf-8'))
+        if self.max_bytes:
+            self.evict(self.max_bytes)
+
+    def _put_raw(self, key, raw, created=None):
+        now = time.time()
+        body = zlib.compress(raw)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, body, size, created, accessed) VALUES (?, ?, ?, ?, ?)',
+                (key, body, len(body), created or now, now),
+            )
+
+    def total_bytes(self):
+        return self._connect().execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def evict(self, max_bytes):
+        total = self.total_bytes()
+        if total <= max_bytes:
+            return 0
+        evicted = 0
+        conn = self._connect()
+        with conn:
+            rows = conn.execute('SELECT key, size FROM responses ORDER BY accessed').fetchall()
+            for key, size in rows:
+                if total <= max_bytes:
+                    break
+                conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                total -= size
+                evicted += 1
+        return evicted
+
+    def compact(self, max_age=None):
+        """Drop expired and over-budget entries, then rewrite the file."""
+        conn = self._connect()
+        removed = 0
+        if max_age:
+            with conn:
+                removed += conn.execute(
+                    'DELETE FROM responses WHERE created < ?', (time.time() - max_age,)
+                ).rowcount
+        if self.max_bytes:
+            removed += self.evict(self.max_bytes)
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.execute('VACUUM')
+        return removed
+
+    def import_directory(self, directory, overwrite=False):
+        """Load existing osmnx <sha1>.json cache files; returns (imported, skipped)."""
+        imported = skipped = 0
+        for path in sorted(Path(directory).glob('*.json')):
+            key = path.stem
+            if not overwrite and key in self:
+                skipped += 1
+                continue
+            raw = path.read_bytes()
+            try:
+                json.loads(raw)
+            except ValueError:
+                logger.warning('Skipping unreadable cache file %s', path)
+                skipped += 1
+                continue
+            self._put_raw(key, raw, created=path.stat().st_mtime)
+            imported += 1
+        if self.max_bytes:
+            self.evict(self.max_bytes)
+        return imported, skipped
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'entries': len(self),
+            'bytes': self.total_bytes(),
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def install(store):
+    """Route osmnx's response cache through `store` instead of per-file JSON.
+
+    osmnx has no public hook for its cache, so this swaps the two private
+    helpers that Overpass, Nominatim and elevation requests go through.
+    """
+    from osmnx import _http, settings as ox_settings
+
+    def retrieve_from_cache(url):
+        if not ox_settings.use_cache:
+            return None
+        return store.get(cache_key(url))
+
+    def save_to_cache(url, response_json, ok):
+        if not ox_settings.use_cache or not ok or response_json is None:
+            return
+        if isinstance(response_json, dict) and 'remark' in response_json:
+            return
+        store.put(cache_key(url), response_json)
+
+    _http._retrieve_from_cache = retrieve_from_cache
+    _http._save_to_cache = save_to_cache
+    return store
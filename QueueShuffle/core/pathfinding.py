@@ -0,0 +1,109 @@
+import heapq
+from itertools import count
+
+
+def _edge_weight_function(G, weight):
+    if G.is_multigraph():
+        return lambda keydict: min(d.get(weight, 1) for d in keydict.values())
+    return lambda data: data.get(weight, 1)
+
+
+def iter_targets_by_distance(G, source, targets, weight='length'):
+    """Single-source Dijkstra that yields (node, distance) for every node in
+    `targets` in order of increasing road distance from `source`.
+
+    The search is lazy: it only expands the graph as far as needed to settle
+    the next target, so a caller that stops after the first k targets never
+    pays for the rest of the network.
+    """
+    succ = G._succ if G.is_directed() else G._adj
+    edge_weight = _edge_weight_function(G, weight)
+    remaining = set(targets)
+
+    dist = {}
+    seen = {source: 0}
+    tie = count()
+    heap = [(0, next(tie), source)]
+
+    while heap and remaining:
+        d, _, u = heapq.heappop(heap)
+        if u in dist:
+            continue
+        dist[u] = d
+        if u in remaining:
+            remaining.discard(u)
+            yield u, d
+        for v, data in succ[u].items():
+            vd = d + edge_weight(data)
+            if v in dist:
+                continue
+            if v not in seen or vd < seen[v]:
+                seen[v] = vd
+                heapq.heappush(heap, (vd, next(tie), v))
+
+
+def nearest_targets(G, source, targets, k, weight='length'):
+    """Return the k closest nodes of `targets` as a list of (node, distance)."""
+    results = []
+    if k <= 0:
+        return results
+    for node, distance in iter_targets_by_distance(G, source, targets, weight):
+        results.append((node, distance))
+        if len(results) >= k:
+            break
+    return results
+
+
+def iter_csr_targets_by_distance(indptr, indices, weights, source, targets):
+    """Same as iter_targets_by_distance, over a CSR adjacency of node indices."""
+    remaining = set(targets)
+
+    dist = {}
+    seen = {source: 0.0}
+    heap = [(0.0, source)]
+
+    while heap and remaining:
+        d, u = heapq.heappop(heap)
+        if u in dist:
+            continue
+        dist[u] = d
+        if u in remaining:
+            remaining.discard(u)
+            yield u, d
+        start, end = int(indptr[u]), int(indptr[u + 1])
+        for v, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            vd = d + w
+            if v in dist:
+                continue
+            if v not in seen or vd < seen[v]:
+                seen[v] = vd
+                heapq.heappush(heap, (vd, v))
+
+
+def csr_distances_within(indptr, indices, weights, source, max_distance):
+    """{node: distance} for every node within `max_distance` of `source`.
+
+    One Dijkstra that stops expanding once the next node is beyond the
+    bound, so the cost depends on the radius rather than the graph size.
+    """
+    dist = {}
+    seen = {source: 0.0}
+    heap = [(0.0, source)]
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > max_distance:
+            break
+        if u in dist:
+            continue
+        dist[u] = d
+        start, end = int(indptr[u]), int(indptr[u + 1])
+        for v, w in zip(indices[start:end].tolist(), weights[start:end].tolist()):
+            vd = d + w
+            if v in dist or vd > max_distance:
+                continue
+            if v not in seen or vd < seen[v]:
+                seen[v] = vd
+                heapq.heappush(heap, (vd, v))
+    return dist
+
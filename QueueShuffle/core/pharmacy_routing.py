@@ -0,0 +1,524 @@
+from django.http import JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from .pathfinding import iter_targets_by_distance
+from .road_graph import RoadGraph, read_meta
+from .contraction import ContractionHierarchy
+from .pharmacy_table import NearestPharmacyTable
+from .result_cache import LRUCache
+from .overpass_cache import OverpassCacheStore, install
+from . import metrics, warmup
+import numpy as np
+import osmnx as ox
+import networkx as nx
+import gc
+import json
+import math
+import time
+
+# Pharmacy routing and everything that needs the geospatial stack (osmnx,
+# networkx, numpy, geopandas). views imports this module on the first
+# pharmacy request, so workers that only serve queue pages and WebSockets
+# never load it. ROUTING_PRELOAD loads it with the graph at startup instead.
+
+if getattr(settings, 'OVERPASS_CACHE_PATH', None):
+    install(OverpassCacheStore(settings.OVERPASS_CACHE_PATH, getattr(settings, 'OVERPASS_CACHE_MAX_BYTES', None)))
+
+GRAPH_CACHE = None
+# Final top-k results per (routing mode, snapped user node). Cleared whenever
+# the graph or the pharmacy index is rebuilt.
+PHARMACY_RESULT_CACHE = LRUCache(
+    maxsize=getattr(settings, 'PHARMACY_RESULT_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'PHARMACY_RESULT_CACHE_TTL', 600),
+)
+# Isochrones per (snapped node, radius bucket); see isochrone() below.
+ISOCHRONE_CACHE = LRUCache(
+    maxsize=getattr(settings, 'ISOCHRONE_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'ISOCHRONE_CACHE_TTL', 600),
+)
+GRAPH_PLACE = 'Bengaluru, India'
+ROAD_GRAPH_PATH = getattr(settings, 'ROAD_GRAPH_PATH', None)
+
+def load_road_graph():
+    return warmup.GRAPH.load(lambda: GRAPH_CACHE, map_road_graph)
+
+def map_road_graph():
+    global GRAPH_CACHE
+    if GRAPH_CACHE is None and ROAD_GRAPH_PATH and RoadGraph.exists(ROAD_GRAPH_PATH):
+        start_time = time.time()
+        with metrics.timed('graph.load', source='road_graph'):
+            GRAPH_CACHE = RoadGraph.load(ROAD_GRAPH_PATH)
+        PHARMACY_RESULT_CACHE.clear()
+        ISOCHRONE_CACHE.clear()
+        print(f"--- Memory-mapped road graph ({len(GRAPH_CACHE)} nodes) in {time.time() - start_time:.3f} seconds. ---")
+    return GRAPH_CACHE
+
+# Saved artifacts found to come from a different road graph, as
+# (path, graph checksum), so each mismatch is only read and reported once.
+STALE_GRAPH_ARTIFACTS = set()
+
+def built_from_current_graph(path, label):
+    """Whether the CH/table saved at `path` was built from the loaded graph.
+
+    Anything built from another graph (or before artifacts recorded their
+    graph) would give KeyErrors or wrong distances, so it is not loaded and
+    its routing mode falls back to single_source.
+    """
+    G = GRAPH_CACHE
+    if not isinstance(G, RoadGraph):
+        return False
+    fingerprint = G.fingerprint()
+    key = (str(path), fingerprint['checksum'])
+    if key in STALE_GRAPH_ARTIFACTS:
+        return False
+    if read_meta(path).get('graph') == fingerprint:
+        return True
+    STALE_GRAPH_ARTIFACTS.add(key)
+    print(f"--- Not loading the {label} at {path}: it was built from a different road graph. Rebuild it. ---")
+    return False
+
+CONTRACTION_HIERARCHY = None
+CONTRACTION_HIERARCHY_PATH = getattr(settings, 'CONTRACTION_HIERARCHY_PATH', None)
+
+def get_contraction_hierarchy():
+    global CONTRACTION_HIERARCHY
+    if (CONTRACTION_HIERARCHY is None and CONTRACTION_HIERARCHY_PATH
+            and ContractionHierarchy.exists(CONTRACTION_HIERARCHY_PATH)
+            and built_from_current_graph(CONTRACTION_HIERARCHY_PATH, 'contraction hierarchy')):
+        start_time = time.time()
+        with metrics.timed('graph.load', source='contraction_hierarchy'):
+            CONTRACTION_HIERARCHY = ContractionHierarchy.load(CONTRACTION_HIERARCHY_PATH)
+        print(f"--- Memory-mapped contraction hierarchy in {time.time() - start_time:.3f} seconds. ---")
+    return CONTRACTION_HIERARCHY
+
+NEAREST_PHARMACY_TABLE = None
+NEAREST_PHARMACY_TABLE_PATH = getattr(settings, 'NEAREST_PHARMACY_TABLE_PATH', None)
+
+def get_nearest_pharmacy_table():
+    global NEAREST_PHARMACY_TABLE
+    if (NEAREST_PHARMACY_TABLE is None and NEAREST_PHARMACY_TABLE_PATH
+            and NearestPharmacyTable.exists(NEAREST_PHARMACY_TABLE_PATH)
+            and built_from_current_graph(NEAREST_PHARMACY_TABLE_PATH, 'nearest-pharmacy table')):
+        start_time = time.time()
+        with metrics.timed('graph.load', source='pharmacy_table'):
+            NEAREST_PHARMACY_TABLE = NearestPharmacyTable.load(NEAREST_PHARMACY_TABLE_PATH)
+        print(f"--- Memory-mapped nearest-pharmacy table (k={NEAREST_PHARMACY_TABLE.k}) in {time.time() - start_time:.3f} seconds. ---")
+    return NEAREST_PHARMACY_TABLE
+
+def get_graph():
+    # Single-flight: concurrent first requests share one build.
+    return warmup.GRAPH.load(lambda: GRAPH_CACHE, build_graph)
+
+def build_graph():
+    global GRAPH_CACHE
+    if map_road_graph() is None:
+        print("--- Caching road network graph for Bengaluru. This will happen only once. ---")
+        start_time = time.time()
+        with metrics.timed('graph.load', source='osmnx'):
+            G = ox.graph_from_place(GRAPH_PLACE, network_type='drive')
+            # Routing only needs ids, coordinates and lengths. Keep those as
+            # arrays and let the MultiDiGraph (tags, geometry, a dict per
+            # node and edge) go, which is most of a worker's memory.
+            GRAPH_CACHE = RoadGraph.from_networkx(G)
+            del G
+            gc.collect()
+        PHARMACY_RESULT_CACHE.clear()
+        ISOCHRONE_CACHE.clear()
+        print(f"--- Graph cached ({len(GRAPH_CACHE)} nodes) in {time.time() - start_time:.2f} seconds. ---")
+    return GRAPH_CACHE
+
+def graph_bounds(G):
+    if isinstance(G, RoadGraph):
+        return G.bounds()
+    nodes_data = list(G.nodes(data=True))
+    lats = [data['y'] for _, data in nodes_data]
+    lons = [data['x'] for _, data in nodes_data]
+    return max(lats), min(lats), max(lons), min(lons)
+
+def snap_to_graph(G, X, Y):
+    if isinstance(G, RoadGraph):
+        return G.nearest_nodes(X, Y)
+    return ox.nearest_nodes(G, X, Y)
+
+def search_graph(G, source, targets):
+    if isinstance(G, RoadGraph):
+        return G.iter_targets_by_distance(source, targets)
+    return iter_targets_by_distance(G, source, targets, weight='length')
+
+def distances_within(G, source, max_distance):
+    if isinstance(G, RoadGraph):
+        return G.distances_within(source, max_distance)
+    return nx.single_source_dijkstra_path_length(G, source, cutoff=max_distance, weight='length')
+
+def node_coordinates(G, nodes):
+    if isinstance(G, RoadGraph):
+        idx = G.index_of(nodes)
+        return G.x[idx], G.y[idx]
+    return (np.array([G.nodes[n]['x'] for n in nodes], dtype=float),
+            np.array([G.nodes[n]['y'] for n in nodes], dtype=float))
+
+def road_distance(G, source, target):
+    if isinstance(G, RoadGraph):
+        for _, distance in G.iter_targets_by_distance(source, (target,)):
+            return distance
+        raise nx.NetworkXNoPath(f"No path between {source} and {target}.")
+    return nx.dijkstra_path_length(G, source=source, target=target, weight='length')
+
+PHARMACY_CACHE = None
+PHARMACY_NODE_INDEX = None
+PHARMACY_CH_BUCKETS = None
+PHARMACY_TABLE_CURRENT = None
+PHARMACY_RESULT_LIMIT = 5
+PHARMACY_ROUTING_MODE = getattr(settings, 'PHARMACY_ROUTING_MODE', 'single_source')
+
+def build_pharmacy_index(G, gdf):
+    if gdf.empty:
+        return {}
+
+    # Snap every pharmacy to the road graph in one vectorized call.
+    with metrics.timed('pharmacy.index_snap'):
+        nodes = snap_to_graph(G, gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy())
+    names = gdf['name'] if 'name' in gdf.columns else [None] * len(gdf)
+
+    index = {}
+    for node, name in zip(nodes, names):
+        if not isinstance(name, str):
+            name = 'Unnamed Pharmacy'
+        index.setdefault(node, []).append(name)
+    return index
+
+def set_pharmacy_index(index):
+    global PHARMACY_NODE_INDEX, PHARMACY_CH_BUCKETS, PHARMACY_TABLE_CURRENT
+    PHARMACY_NODE_INDEX = index
+    PHARMACY_CH_BUCKETS = None
+    PHARMACY_TABLE_CURRENT = None
+    PHARMACY_RESULT_CACHE.clear()
+    ISOCHRONE_CACHE.clear()
+
+def get_pharmacy_index(G):
+    return warmup.PHARMACIES.load(
+        lambda: PHARMACY_NODE_INDEX if PHARMACY_CACHE is not None else None,
+        lambda: build_pharmacy_cache(G),
+    )
+
+def build_pharmacy_cache(G):
+    global PHARMACY_CACHE
+    if PHARMACY_CACHE is None:
+        print("--- Caching all pharmacies in Bengaluru. This happens once. ---")
+        start_time = time.time()
+
+        north, south, east, west = graph_bounds(G)
+
+        tags = {"amenity": "pharmacy"}
+        with metrics.timed('pharmacy.fetch'):
+            gdf = ox.features_from_bbox((north, south, east, west), tags)
+        gdf = gdf[gdf.geom_type == 'Point']
+
+        # Index before cache: lock-free readers check PHARMACY_CACHE first.
+        set_pharmacy_index(build_pharmacy_index(G, gdf))
+        PHARMACY_CACHE = gdf
+        print(f"--- Cached {len(gdf)} pharmacies on {len(PHARMACY_NODE_INDEX)} road nodes in {time.time() - start_time:.2f} seconds. ---")
+
+    if PHARMACY_NODE_INDEX is None:
+        set_pharmacy_index(build_pharmacy_index(G, PHARMACY_CACHE))
+
+    return PHARMACY_NODE_INDEX
+
+def pharmacy_result(name, distance):
+    return {
+        'name': name,
+        'vicinity': f"{distance:.0f} meters away",
+        'distance_numeric': distance
+    }
+
+# Each routing mode returns (pharmacy node, distance) pairs in distance order,
+# just enough of them to fill `limit` results; rank_pharmacy_hits turns those
+# into the response entries.
+
+def enough_pharmacies(pharmacy_index, hits, limit):
+    found = []
+    names = 0
+    for node, distance in hits:
+        found.append((node, distance))
+        names += len(pharmacy_index[node])
+        if names >= limit:
+            break
+    return found
+
+def search_pharmacies_pairwise(G, pharmacy_index, user_node, limit):
+    hits = []
+    for pharmacy_node in pharmacy_index:
+        try:
+            hits.append((pharmacy_node, road_distance(G, user_node, pharmacy_node)))
+        except (nx.NetworkXNoPath, KeyError):
+            continue
+    hits.sort(key=lambda hit: hit[1])
+    return enough_pharmacies(pharmacy_index, hits, limit)
+
+def search_pharmacies_single_source(G, pharmacy_index, user_node, limit):
+    # One bounded search from the user: nodes are settled in distance order,
+    # so we can stop as soon as enough pharmacies have been reached.
+    return enough_pharmacies(pharmacy_index, search_graph(G, user_node, pharmacy_index), limit)
+
+def search_pharmacies_ch(G, pharmacy_index, user_node, limit):
+    global PHARMACY_CH_BUCKETS
+    ch = get_contraction_hierarchy()
+    if PHARMACY_CH_BUCKETS is None:
+        PHARMACY_CH_BUCKETS = ch.target_buckets(pharmacy_index)
+    return enough_pharmacies(pharmacy_index, ch.nearest_targets(user_node, PHARMACY_CH_BUCKETS, limit), limit)
+
+def search_pharmacies_table(G, pharmacy_index, user_node, limit):
+    return enough_pharmacies(pharmacy_index, get_nearest_pharmacy_table().lookup(user_node), limit)
+
+def rank_pharmacy_hits(pharmacy_index, hits, limit):
+    results = []
+    for node, distance in hits:
+        results.extend(pharmacy_result(name, distance) for name in pharmacy_index[node])
+    return results[:limit]
+
+PHARMACY_ROUTING_MODES = {
+    'pairwise': search_pharmacies_pairwise,
+    'single_source': search_pharmacies_single_source,
+    'ch': search_pharmacies_ch,
+    'table': search_pharmacies_table,
+}
+
+def routing_mode_error(mode, pharmacy_index):
+    global PHARMACY_TABLE_CURRENT
+    if mode == 'ch' and get_contraction_hierarchy() is None:
+        return 'Contraction hierarchy has not been built'
+    if mode == 'table':
+        table = get_nearest_pharmacy_table()
+        if table is None:
+            return 'Nearest-pharmacy table has not been built'
+        if PHARMACY_TABLE_CURRENT is None:
+            PHARMACY_TABLE_CURRENT = table.matches(pharmacy_index)
+        if not PHARMACY_TABLE_CURRENT:
+            return 'Nearest-pharmacy table is out of date; rebuild it with build_pharmacy_table'
+    return None
+
+class RoutingRequestError(Exception):
+    def __init__(self, message, status):
+        # Both go in args so the error survives pickling back from a pool worker.
+        super().__init__(message, status)
+        self.message = message
+        self.status = status
+
+    def __str__(self):
+        return self.message
+
+def nearest_pharmacies(G, pharmacy_index, user_point, mode):
+    """Response entries for the pharmacies nearest to (lat, lon) by road."""
+    if not pharmacy_index:
+        return []
+
+    with metrics.timed('pharmacy.snap'):
+        user_node = snap_to_graph(G, user_point[1], user_point[0])
+
+    if mode not in PHARMACY_ROUTING_MODES:
+        raise RoutingRequestError(f"Unknown routing mode '{mode}'", 400)
+
+    # ch and table need prebuilt data that matches the current graph and
+    # pharmacies; without it, answer with the (exact) single-source search.
+    if routing_mode_error(mode, pharmacy_index):
+        metrics.increment('pharmacy.mode_fallback', mode=mode)
+        mode = 'single_source'
+
+    cache_key = (mode, user_node)
+    final_results = PHARMACY_RESULT_CACHE.get(cache_key)
+    metrics.increment('pharmacy.result_cache', result='miss' if final_results is None else 'hit')
+    if final_results is None:
+        with metrics.timed('pharmacy.search', mode=mode):
+            hits = PHARMACY_ROUTING_MODES[mode](G, pharmacy_index, user_node, PHARMACY_RESULT_LIMIT)
+        with metrics.timed('pharmacy.rank'):
+            sorted_results = rank_pharmacy_hits(pharmacy_index, hits, PHARMACY_RESULT_LIMIT)
+        final_results = [{'name': r['name'], 'vicinity': r['vicinity']} for r in sorted_results]
+        PHARMACY_RESULT_CACHE.set(cache_key, final_results)
+    return final_results
+
+def parse_user_point(request):
+    lat_str = request.GET.get('lat')
+    lon_str = request.GET.get('lon')
+    if not lat_str or not lon_str:
+        raise RoutingRequestError('Latitude and longitude are required', 400)
+    try:
+        return float(lat_str), float(lon_str)
+    except ValueError:
+        raise RoutingRequestError('Latitude and longitude must be numbers', 400)
+
+def find_pharmacies_dijkstra_api(request):
+    try:
+        user_point = parse_user_point(request)
+        G = get_graph()
+        pharmacy_index = get_pharmacy_index(G)
+        mode = request.GET.get('mode', PHARMACY_ROUTING_MODE)
+        return JsonResponse({'pharmacies': nearest_pharmacies(G, pharmacy_index, user_point, mode)})
+
+    except RoutingRequestError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'error': f"An internal error occurred: {str(e)}"}, status=500)
+
+# --- Many-to-many distances ---
+# POST {"origins": [[lat, lon], ...], "k": 5} streams one NDJSON line per
+# origin with its k nearest pharmacies. Without "k" the first line lists every
+# pharmacy node as a column and each origin row holds its road distance to
+# each of them (null when unreachable).
+
+DISTANCE_MATRIX_MAX_ORIGINS = getattr(settings, 'DISTANCE_MATRIX_MAX_ORIGINS', 10000)
+
+def pharmacy_columns(pharmacy_index):
+    return [{'node': int(node), 'names': names} for node, names in pharmacy_index.items()]
+
+def distance_row(G, pharmacy_index, user_node, k=None):
+    if k is None:
+        # A full matrix row has to reach every pharmacy, so search to the end.
+        found = dict(search_graph(G, user_node, pharmacy_index))
+        return {'distances': [round(found[node], 1) if node in found else None for node in pharmacy_index]}
+    hits = search_pharmacies_single_source(G, pharmacy_index, user_node, k)
+    return {'pharmacies': [
+        {'name': r['name'], 'distance': round(r['distance_numeric'], 1)}
+        for r in rank_pharmacy_hits(pharmacy_index, hits, k)
+    ]}
+
+def parse_distance_request(request):
+    try:
+        body = json.loads(request.body)
+        origins = body['origins']
+        lats = [float(lat) for lat, _ in origins]
+        lons = [float(lon) for _, lon in origins]
+    except (ValueError, KeyError, TypeError):
+        raise RoutingRequestError('Body must be JSON like {"origins": [[lat, lon], ...]}', 400)
+    if not origins:
+        raise RoutingRequestError('At least one origin is required', 400)
+    if len(origins) > DISTANCE_MATRIX_MAX_ORIGINS:
+        raise RoutingRequestError(f'At most {DISTANCE_MATRIX_MAX_ORIGINS} origins per request', 400)
+
+    k = body.get('k')
+    if k is not None and (not isinstance(k, int) or isinstance(k, bool) or k < 1):
+        raise RoutingRequestError('k must be a positive integer', 400)
+    return lats, lons, k
+
+def pharmacy_distances_api(request):
+    from . import routing_pool
+
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST a JSON body'}, status=405)
+    try:
+        lats, lons, k = parse_distance_request(request)
+        G = get_graph()
+        pharmacy_index = get_pharmacy_index(G)
+        # One vectorized snap for every origin.
+        with metrics.timed('pharmacy.snap'):
+            user_nodes = [int(node) for node in snap_to_graph(G, np.array(lons), np.array(lats))]
+    except RoutingRequestError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'error': f"An internal error occurred: {str(e)}"}, status=500)
+
+    metrics.observe('pharmacy.matrix_origins', len(user_nodes), buckets=metrics.SIZE_BUCKETS)
+
+    # An async generator, so under ASGI each row goes out as soon as its chunk
+    # is done and a slow client holds back the pool; a sync one would be
+    # drained into a list on the shared sync thread before sending anything.
+    async def lines():
+        if k is None:
+            yield json.dumps({'pharmacies': pharmacy_columns(pharmacy_index)}) + '\n'
+        try:
+            origin = 0
+            async for row in routing_pool.aiter_distance_rows(G, pharmacy_index, user_nodes, k):
+                yield json.dumps({'origin': origin, 'node': user_nodes[origin], **row}) + '\n'
+                origin += 1
+        except Exception as e:
+            # Headers are already sent, so report the failure in-band.
+            import traceback
+            traceback.print_exc()
+            yield json.dumps({'error': f"An internal error occurred: {str(e)}"}) + '\n'
+
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+# --- Isochrones ---
+# GET /api/isochrone/?lat=..&lon=..&radius=1000 returns the pharmacies
+# within `radius` metres by road and a polygon around the reachable part of
+# the network. Radii are rounded up to ISOCHRONE_BUCKET_M so nearby requests
+# share one bounded search; only the pharmacy list and the boundary are
+# cached, never the reachable node set.
+
+ISOCHRONE_BUCKET_M = getattr(settings, 'ISOCHRONE_BUCKET_M', 250)
+ISOCHRONE_MAX_RADIUS_M = getattr(settings, 'ISOCHRONE_MAX_RADIUS_M', 5000)
+# Concave hull tightness (0 hugs the points, 1 is the convex hull) and the
+# simplification tolerance in degrees (~10 m).
+ISOCHRONE_HULL_RATIO = 0.3
+ISOCHRONE_SIMPLIFY = 0.0001
+
+def isochrone_boundary(xs, ys):
+    import shapely
+    from shapely.geometry import mapping
+
+    if len(xs) == 0:
+        return None
+    hull = shapely.concave_hull(shapely.multipoints(np.column_stack([xs, ys])), ratio=ISOCHRONE_HULL_RATIO)
+    hull = shapely.set_precision(hull.simplify(ISOCHRONE_SIMPLIFY), 1e-6)
+    return mapping(hull)
+
+def isochrone(G, pharmacy_index, user_node, bucket_radius):
+    """(reachable node count, [(pharmacy node, distance)], boundary) within bucket_radius."""
+    cache_key = (user_node, bucket_radius)
+    result = ISOCHRONE_CACHE.get(cache_key)
+    metrics.increment('pharmacy.isochrone_cache', result='miss' if result is None else 'hit')
+    if result is None:
+        with metrics.timed('pharmacy.isochrone'):
+            reachable = distances_within(G, user_node, bucket_radius)
+            hits = sorted(
+                ((node, reachable[node]) for node in pharmacy_index if node in reachable),
+                key=lambda hit: hit[1],
+            )
+            boundary = isochrone_boundary(*node_coordinates(G, list(reachable)))
+        result = (len(reachable), hits, boundary)
+        ISOCHRONE_CACHE.set(cache_key, result)
+    return result
+
+def parse_radius(request):
+    try:
+        radius = float(request.GET.get('radius', ''))
+    except ValueError:
+        raise RoutingRequestError('radius (metres) is required and must be a number', 400)
+    if not 0 < radius <= ISOCHRONE_MAX_RADIUS_M:
+        raise RoutingRequestError(f'radius must be between 0 and {ISOCHRONE_MAX_RADIUS_M} metres', 400)
+    return radius
+
+def isochrone_api(request):
+    try:
+        user_point = parse_user_point(request)
+        radius = parse_radius(request)
+        G = get_graph()
+        pharmacy_index = get_pharmacy_index(G)
+        with metrics.timed('pharmacy.snap'):
+            user_node = snap_to_graph(G, user_point[1], user_point[0])
+
+        bucket_radius = math.ceil(radius / ISOCHRONE_BUCKET_M) * ISOCHRONE_BUCKET_M
+        reachable_nodes, hits, boundary = isochrone(G, pharmacy_index, user_node, bucket_radius)
+        hits = [hit for hit in hits if hit[1] <= radius]
+        return JsonResponse({
+            'radius': radius,
+            # The boundary is drawn for the bucketed radius, which may be a
+            # little larger than the one asked for.
+            'boundary_radius': bucket_radius,
+            'reachable_nodes': reachable_nodes,
+            'pharmacies': [
+                {'name': r['name'], 'distance': round(r['distance_numeric'], 1)}
+                for r in rank_pharmacy_hits(pharmacy_index, hits, None)
+            ],
+            'boundary': boundary,
+        })
+
+    except RoutingRequestError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({'error': f"An internal error occurred: {str(e)}"}, status=500)
+
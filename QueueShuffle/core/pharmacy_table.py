@@ -0,0 +1,93 @@
+import heapq
+
+import numpy as np
+
+from .road_graph import array_store_exists, load_arrays, read_meta, save_arrays
+
+ARRAYS = ('node_ids', 'pharmacy_nodes', 'nearest', 'distances')
+
+
+class NearestPharmacyTable:
+    """For every road node, the k closest pharmacy nodes by road distance.
+
+    `nearest[i]` holds pharmacy node ids (-1 when fewer than k are reachable)
+    and `distances[i]` the matching distances in metres, in increasing order.
+    `pharmacy_nodes` records the pharmacy set the table was built for, so a
+    stale table can be detected after the pharmacy data changes, and `graph`
+    the RoadGraph.fingerprint() of the road graph, for the same reason.
+    """
+
+    def __init__(self, node_ids, pharmacy_nodes, nearest, distances, graph=None):
+        self.node_ids = node_ids
+        self.graph = graph
+        self.pharmacy_nodes = pharmacy_nodes
+        self.nearest = nearest
+        self.distances = distances
+
+    @property
+    def k(self):
+        return self.nearest.shape[1]
+
+    @classmethod
+    def build(cls, road_graph, pharmacy_nodes, k):
+        # Multi-source Dijkstra on the reversed graph: each label is a
+        # (distance, node, pharmacy) triple and a node keeps its first k
+        # distinct pharmacies, which are exactly its k nearest ones.
+        reverse = road_graph.reversed()
+        indptr, indices, lengths = reverse.indptr, reverse.indices, reverse.lengths
+        pharmacy_nodes = np.unique(np.asarray(list(pharmacy_nodes), dtype=np.int64))
+        sources = road_graph.index_of(pharmacy_nodes).tolist()
+
+        n = len(road_graph)
+        labels = [[] for _ in range(n)]
+        heap = [(0.0, idx, idx) for idx in sources]
+        heapq.heapify(heap)
+        while heap:
+            d, u, source = heapq.heappop(heap)
+            found = labels[u]
+            if len(found) >= k or any(s == source for s, _ in found):
+                continue
+            found.append((source, d))
+            start, end = int(indptr[u]), int(indptr[u + 1])
+            for v, w in zip(indices[start:end].tolist(), lengths[start:end].tolist()):
+                if len(labels[v]) < k:
+                    heapq.heappush(heap, (d + w, v, source))
+
+        nearest = np.full((n, k), -1, dtype=np.int64)
+        distances = np.full((n, k), np.inf, dtype=np.float64)
+        for u, found in enumerate(labels):
+            for j, (source, d) in enumerate(found):
+                nearest[u, j] = road_graph.node_ids[source]
+                distances[u, j] = d
+        return cls(np.asarray(road_graph.node_ids), pharmacy_nodes, nearest, distances,
+                   graph=road_graph.fingerprint())
+
+    @staticmethod
+    def exists(path):
+        return array_store_exists(path)
+
+    def save(self, path):
+        save_arrays(path, {name: getattr(self, name) for name in ARRAYS}, {
+            'nodes': len(self.node_ids),
+            'pharmacies': len(self.pharmacy_nodes),
+            'k': self.k,
+            'graph': self.graph,
+        })
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(**load_arrays(path, ARRAYS, mmap), graph=read_meta(path).get('graph'))
+
+    def matches(self, pharmacy_nodes):
+        expected = np.unique(np.asarray(list(pharmacy_nodes), dtype=np.int64))
+        return np.array_equal(expected, self.pharmacy_nodes)
+
+    def lookup(self, node_id):
+        idx = int(np.searchsorted(self.node_ids, node_id))
+        if idx >= len(self.node_ids) or self.node_ids[idx] != node_id:
+            raise KeyError(node_id)
+        return [
+            (pharmacy, float(distance))
+            for pharmacy, distance in zip(self.nearest[idx].tolist(), self.distances[idx].tolist())
+            if pharmacy != -1
+        ]
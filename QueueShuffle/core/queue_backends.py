@@ -0,0 +1,371 @@
+import random
+import threading
+from collections import deque
+
+from .indexed_queue import IndexedQueue
+
+SPECIALTIES = ('Cardiology', 'Neurology', 'General Physician')
+
+QUEUE_NUMBER_MIN = 1000
+QUEUE_NUMBER_MAX = 9999
+
+
+class QueueNumbersExhausted(Exception):
+    pass
+
+
+def shuffled_queue_numbers(low=QUEUE_NUMBER_MIN, high=QUEUE_NUMBER_MAX, rng=random):
+    numbers = [f"P-{n}" for n in range(low, high + 1)]
+    rng.shuffle(numbers)
+    return numbers
+
+
+class QueueNumberAllocator:
+    """Hands out unique P-XXXX numbers in O(1) from a pre-shuffled pool.
+
+    Released numbers go to the back of the pool so they are not reused
+    straight away.
+    """
+
+    def __init__(self, low=QUEUE_NUMBER_MIN, high=QUEUE_NUMBER_MAX, rng=random, in_use=()):
+        self._in_use = set(in_use)
+        self._pool = deque(n for n in shuffled_queue_numbers(low, high, rng) if n not in self._in_use)
+
+    def __len__(self):
+        return len(self._pool)
+
+    def allocate(self):
+        if not self._pool:
+            raise QueueNumbersExhausted(f"All {len(self._in_use)} queue numbers are in use")
+        number = self._pool.popleft()
+        self._in_use.add(number)
+        return number
+
+    def release(self, number):
+        if number in self._in_use:
+            self._in_use.remove(number)
+            self._pool.append(number)
+
+
+class InMemoryQueueBackend:
+    """Process-local queues; fast, but only correct with a single worker."""
+
+    # Operations are plain dict/list work, so async callers can run them
+    # on the event loop without a thread hop.
+    blocking = False
+
+    def __init__(self, specialties=SPECIALTIES):
+        self.specialty_names = tuple(specialties)
+        # Sync views change the queues on Django's sync thread while consumers
+        # read them on the event loop; an IndexedQueue rebuild seen half-done
+        # gives wrong positions. Every access holds this lock (re-entrant so
+        # subclasses can wrap these methods in it too).
+        self._lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queues = {specialty: IndexedQueue() for specialty in self.specialty_names}
+            self.queue_numbers = {}
+            self.session_specialty = {}
+            self.allocator = QueueNumberAllocator()
+
+    def specialties(self):
+        return list(self.specialty_names)
+
+    def enqueue(self, specialty, session_key):
+        with self._lock:
+            queue = self.queues.get(specialty)
+            if queue is None or session_key in self.session_specialty:
+                return self.queue_numbers.get(session_key)
+
+            if session_key not in self.queue_numbers:
+                self.queue_numbers[session_key] = self.allocator.allocate()
+            queue.append(session_key)
+            self.session_specialty[session_key] = specialty
+            return self.queue_numbers[session_key]
+
+    def dequeue(self, specialty):
+        with self._lock:
+            queue = self.queues.get(specialty)
+            if not queue:
+                return None
+            session_key = queue.popleft()
+            self.session_specialty.pop(session_key, None)
+            self.allocator.release(self.queue_numbers.pop(session_key, None))
+            return session_key
+
+    def position(self, specialty, session_key):
+        with self._lock:
+            queue = self.queues.get(specialty)
+            if queue is None:
+                return -1
+            return queue.position(session_key)
+
+    def positions(self, specialty, session_keys):
+        with self._lock:
+            queue = self.queues.get(specialty)
+            if queue is None:
+                return {session_key: -1 for session_key in session_keys}
+            return {session_key: queue.position(session_key) for session_key in session_keys}
+
+    def count(self, specialty):
+        with self._lock:
+            queue = self.queues.get(specialty)
+            return len(queue) if queue else 0
+
+    def queue_number(self, session_key):
+        with self._lock:
+            return self.queue_numbers.get(session_key)
+
+    def specialty_of(self, session_key):
+        with self._lock:
+            return self.session_specialty.get(session_key)
+
+    def snapshot(self, specialty):
+        with self._lock:
+            queue = self.queues.get(specialty, ())
+            return [(session_key, self.queue_numbers.get(session_key)) for session_key in queue]
+
+
+class JournaledQueueBackend(InMemoryQueueBackend):
+    """In-memory queues that survive restarts through a QueueJournal.
+
+    Reads are untouched. Each change adds one record to the journal's
+    buffer and returns; the journal's writer thread puts it on disk, so a
+    crash can lose at most the last commit window of changes.
+    """
+
+    def __init__(self, journal, specialties=SPECIALTIES):
+        self.journal = None
+        super().__init__(specialties)
+        self.replay(*journal.load())
+        self.journal = journal
+        journal.start()
+
+    @classmethod
+    def open(cls, path, snapshot_every=10000, fsync=True, **kwargs):
+        from .queue_journal import QueueJournal
+        return cls(QueueJournal(path, snapshot_every, fsync), **kwargs)
+
+    def replay(self, state, records):
+        if state is not None:
+            for specialty, entries in state['queues'].items():
+                for session_key, number in entries:
+                    self._restore(specialty, session_key, number)
+        for record in records:
+            if record[0] == 'e':
+                self._restore(*record[1:])
+            elif record[0] == 'd':
+                super().dequeue(record[1])
+            elif record[0] == 'r':
+                super().reset()
+        self.allocator = QueueNumberAllocator(in_use=self.queue_numbers.values())
+
+    def _restore(self, specialty, session_key, number):
+        # Put the recorded number in place first so enqueue doesn't allocate.
+        if specialty in self.queues and session_key not in self.session_specialty:
+            self.queue_numbers[session_key] = number
+            super().enqueue(specialty, session_key)
+
+    def state(self):
+        with self._lock:
+            return {'queues': {
+                specialty: [[session_key, self.queue_numbers.get(session_key)] for session_key in queue]
+                for specialty, queue in self.queues.items()
+            }}
+
+    # The change and its journal record happen under one lock hold, so the
+    # journal order always matches the order changes were made in.
+
+    def reset(self):
+        with self._lock:
+            super().reset()
+            if self.journal is not None:
+                self.journal.append(['r'], self.state)
+
+    def enqueue(self, specialty, session_key):
+        with self._lock:
+            changes = specialty in self.queues and session_key not in self.session_specialty
+            number = super().enqueue(specialty, session_key)
+            if changes:
+                self.journal.append(['e', specialty, session_key, number], self.state)
+            return number
+
+    def dequeue(self, specialty):
+        with self._lock:
+            session_key = super().dequeue(specialty)
+            if session_key is not None:
+                self.journal.append(['d', specialty], self.state)
+            return session_key
+
+    def close(self):
+        self.journal.close()
+
+
+# --- Redis backend ---
+# Each specialty is a sorted set of session keys scored by a per-specialty
+# sequence number, so ZRANK gives the position in O(log n). Enqueue and
+# dequeue run as Lua scripts so the queue, the number pool and the session
+# hashes change together, even with many workers. A snapshot is a script as
+# well: one round trip, and never a session dequeued between the two reads.
+
+ENQUEUE_SCRIPT = """
+local specialty_of, numbers, pool, queue, seq = KEYS[1], KEYS[2], KEYS[3], KEYS[4], KEYS[5]
+local session_key, specialty = ARGV[1], ARGV[2]
+if redis.call('HEXISTS', specialty_of, session_key) == 1 then
+    return redis.call('HGET', numbers, session_key)
+end
+local number = redis.call('HGET', numbers, session_key)
+if not number then
+    number = redis.call('LPOP', pool)
+    if not number then
+        return redis.error_reply('EXHAUSTED queue numbers')
+    end
+    redis.call('HSET', numbers, session_key, number)
+end
+redis.call('ZADD', queue, redis.call('INCR', seq), session_key)
+redis.call('HSET', specialty_of, session_key, specialty)
+return number
+"""
+
+DEQUEUE_SCRIPT = """
+local specialty_of, numbers, pool, queue = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local popped = redis.call('ZPOPMIN', queue, 1)
+local session_key = popped[1]
+if not session_key then
+    return false
+end
+redis.call('HDEL', specialty_of, session_key)
+local number = redis.call('HGET', numbers, session_key)
+if number then
+    redis.call('HDEL', numbers, session_key)
+    redis.call('RPUSH', pool, number)
+end
+return session_key
+"""
+
+SNAPSHOT_SCRIPT = """
+local session_keys = redis.call('ZRANGE', KEYS[1], 0, -1)
+local numbers = {}
+-- unpack() is limited by the Lua stack, so read the numbers in chunks.
+for first = 1, #session_keys, 1000 do
+    local last = math.min(first + 999, #session_keys)
+    local chunk = redis.call('HMGET', KEYS[2], unpack(session_keys, first, last))
+    for i = 1, #chunk do
+        numbers[first + i - 1] = chunk[i]
+    end
+end
+return {session_keys, numbers}
+"""
+
+INIT_POOL_SCRIPT = """
+if redis.call('SETNX', KEYS[1], 1) == 0 then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+for i = 1, #ARGV do
+    redis.call('RPUSH', KEYS[2], ARGV[i])
+end
+return #ARGV
+"""
+
+
+class RedisQueueBackend:
+    """Queues shared by every worker through Redis."""
+
+    blocking = True
+
+    def __init__(self, client, prefix='healthnav:queue:', specialties=SPECIALTIES):
+        self.client = client
+        self.prefix = prefix
+        self.specialty_names = tuple(specialties)
+        self._enqueue = client.register_script(ENQUEUE_SCRIPT)
+        self._dequeue = client.register_script(DEQUEUE_SCRIPT)
+        self._snapshot = client.register_script(SNAPSHOT_SCRIPT)
+        self._init_pool = client.register_script(INIT_POOL_SCRIPT)
+        self._ensure_pool()
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url, decode_responses=True), **kwargs)
+
+    def _key(self, *parts):
+        return self.prefix + ':'.join(parts)
+
+    def _queue_key(self, specialty):
+        return self._key('q', specialty)
+
+    def _ensure_pool(self):
+        self._init_pool(keys=[self._key('pool_ready'), self._key('pool')], args=shuffled_queue_numbers())
+
+    def reset(self):
+        keys = [self._key('specialty'), self._key('numbers'), self._key('pool'), self._key('pool_ready')]
+        for specialty in self.specialty_names:
+            keys += [self._queue_key(specialty), self._key('seq', specialty)]
+        self.client.delete(*keys)
+        self._ensure_pool()
+
+    def specialties(self):
+        return list(self.specialty_names)
+
+    def enqueue(self, specialty, session_key):
+        if specialty not in self.specialty_names:
+            return self.queue_number(session_key)
+        keys = [
+            self._key('specialty'), self._key('numbers'), self._key('pool'),
+            self._queue_key(specialty), self._key('seq', specialty),
+        ]
+        try:
+            return self._enqueue(keys=keys, args=[session_key, specialty])
+        except Exception as e:
+            if 'EXHAUSTED' in str(e):
+                raise QueueNumbersExhausted('All queue numbers are in use') from e
+            raise
+
+    def dequeue(self, specialty):
+        if specialty not in self.specialty_names:
+            return None
+        keys = [self._key('specialty'), self._key('numbers'), self._key('pool'), self._queue_key(specialty)]
+        return self._dequeue(keys=keys) or None
+
+    def position(self, specialty, session_key):
+        if specialty not in self.specialty_names or session_key is None:
+            return -1
+        rank = self.client.zrank(self._queue_key(specialty), session_key)
+        return -1 if rank is None else rank + 1
+
+    def positions(self, specialty, session_keys):
+        session_keys = list(session_keys)
+        if specialty not in self.specialty_names:
+            return {session_key: -1 for session_key in session_keys}
+        pipe = self.client.pipeline(transaction=False)
+        for session_key in session_keys:
+            pipe.zrank(self._queue_key(specialty), session_key or '')
+        ranks = pipe.execute()
+        return {
+            session_key: -1 if rank is None else rank + 1
+            for session_key, rank in zip(session_keys, ranks)
+        }
+
+    def count(self, specialty):
+        if specialty not in self.specialty_names:
+            return 0
+        return self.client.zcard(self._queue_key(specialty))
+
+    def queue_number(self, session_key):
+        if session_key is None:
+            return None
+        return self.client.hget(self._key('numbers'), session_key)
+
+    def specialty_of(self, session_key):
+        if session_key is None:
+            return None
+        return self.client.hget(self._key('specialty'), session_key)
+
+    def snapshot(self, specialty):
+        if specialty not in self.specialty_names:
+            return []
+        session_keys, numbers = self._snapshot(keys=[self._queue_key(specialty), self._key('numbers')])
+        return list(zip(session_keys, numbers))
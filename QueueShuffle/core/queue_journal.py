@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+
+# --- Queue journal ---
+# Every queue change is appended as one JSON line to journal-<generation>.log.
+# Callers only add the record to an in-memory buffer; a writer thread writes
+# whatever has accumulated and fsyncs it once (group commit), so the hot path
+# never waits on the disk. Every `snapshot_every` records the full state is
+# written to snapshot.json and a new generation starts, which keeps startup
+# replay down to one snapshot plus a short journal tail.
+
+SNAPSHOT_FILE = 'snapshot.json'
+
+
+def journal_name(generation):
+    return f'journal-{generation:08d}.log'
+
+
+class QueueJournal:
+    def __init__(self, path, snapshot_every=10000, fsync=True):
+        self.path = str(path)
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(self.path, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._appended = 0  # records handed to append() so far
+        self._committed = 0  # records written (and fsynced) so far
+        self._since_snapshot = 0
+        self._closed = False
+        self._file = None
+        self._writer = None
+        self.generation = 0
+        self.commits = 0
+
+    def load(self):
+        """(snapshot state or None, [records]) to rebuild the queues from.
+
+        Replays every journal from the snapshot's generation on: a crash
+        between starting a new generation and writing its snapshot leaves the
+        newest records in the next file.
+        """
+        state = None
+        snapshot_path = os.path.join(self.path, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path) as f:
+                state = json.load(f)
+            self.generation = state['generation']
+
+        records = []
+        generation = self.generation
+        for name in sorted(os.listdir(self.path)):
+            if not (name.startswith('journal-') and name.endswith('.log')):
+                continue
+            file_generation = int(name[len('journal-'):-len('.log')])
+            if file_generation < self.generation:
+                os.remove(os.path.join(self.path, name))
+                continue
+            generation = file_generation
+            records += self._read_journal(os.path.join(self.path, name))
+        self.generation = generation
+        self._since_snapshot = len(records)
+        return state, records
+
+    @staticmethod
+    def _read_journal(path):
+        """Records in one journal, repairing a tail torn by a crash mid-write.
+
+        The file is cut back to its last complete record, and given the
+        missing newline if needed, so the next append starts on a fresh line
+        instead of gluing itself onto the torn one.
+        """
+        records = []
+        good = 0
+        with open(path, 'r+b') as f:
+            data = f.read()
+            for line in data.splitlines(keepends=True):
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    break
+                good += len(line)
+            if good < len(data):
+                f.truncate(good)
+            if good and not data[:good].endswith(b'\n'):
+                f.seek(good)
+                f.write(b'\n')
+        return records
+
+    def start(self):
+        self._file = open(os.path.join(self.path, journal_name(self.generation)), 'a')
+        self._writer = threading.Thread(target=self._run, name='queue-journal', daemon=True)
+        self._writer.start()
+
+    def append(self, record, snapshot=None):
+        """Queue one record for the next commit.
+
+        `snapshot` is called (under the journal lock, so no other record can
+        slip in) when a snapshot is due and must return the state as of this
+        record.
+        """
+        with self._cond:
+            # The writer only sleeps on an empty buffer, so one wake-up per
+            # batch is enough. Encoding happens on the writer thread too.
+            if not self._buffer:
+                self._cond.notify()
+            self._buffer.append(record)
+            self._appended += 1
+            self._since_snapshot += 1
+            if snapshot is not None and self._since_snapshot >= self.snapshot_every:
+                self._buffer.append(snapshot())
+                self._since_snapshot = 0
+
+    def flush(self, timeout=None):
+        """Block until everything appended so far is on disk."""
+        with self._cond:
+            target = self._appended
+            return self._cond.wait_for(lambda: self._committed >= target or self._writer is None, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._buffer or self._closed)
+                batch, self._buffer = self._buffer, []
+                if not batch and self._closed:
+                    return
+
+            written = 0
+            lines = []
+            for item in batch:
+                if isinstance(item, dict):
+                    self._write(lines)
+                    lines = []
+                    self._rotate(item)
+                else:
+                    lines.append(json.dumps(item, separators=(',', ':')))
+                    written += 1
+            self._write(lines)
+
+            with self._cond:
+                self._committed += written
+                self.commits += 1
+                self._cond.notify_all()
+
+    def _write(self, lines):
+        if not lines:
+            return
+        self._file.write('\n'.join(lines) + '\n')
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def _rotate(self, state):
+        # New generation first, then the snapshot that points at it, then
+        # drop the old journal. Any crash in between replays correctly.
+        previous = self.generation
+        self._file.close()
+        self.generation += 1
+        self._file = open(os.path.join(self.path, journal_name(self.generation)), 'a')
+
+        tmp_path = os.path.join(self.path, SNAPSHOT_FILE + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({**state, 'generation': self.generation}, f, separators=(',', ':'))
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.path, SNAPSHOT_FILE))
+        os.remove(os.path.join(self.path, journal_name(previous)))
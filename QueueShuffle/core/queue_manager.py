@@ -1,52 +1,138 @@
-from collections import deque
-import random
+import asyncio
+import atexit
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from . import metrics
+from .queue_backends import InMemoryQueueBackend, JournaledQueueBackend, RedisQueueBackend
 
-PATIENT_QUEUES = {
-    'Cardiology': deque(),
-    'Neurology': deque(),
-    'General Physician': deque(),
-}
+# 'memory' keeps the queues in this process (single worker only); 'redis'
+# shares them between every daphne/uvicorn worker through QUEUE_REDIS_URL.
+QUEUE_BACKEND = getattr(settings, 'QUEUE_BACKEND', 'memory')
+QUEUE_REDIS_URL = getattr(settings, 'QUEUE_REDIS_URL', 'redis://127.0.0.1:6379/1')
+# 'journal' is 'memory' plus an append-only journal and snapshots under
+# QUEUE_JOURNAL_PATH, replayed when the worker starts.
+QUEUE_JOURNAL_PATH = getattr(settings, 'QUEUE_JOURNAL_PATH', 'queue_journal')
+QUEUE_JOURNAL_SNAPSHOT_EVERY = getattr(settings, 'QUEUE_JOURNAL_SNAPSHOT_EVERY', 10000)
+QUEUE_JOURNAL_FSYNC = getattr(settings, 'QUEUE_JOURNAL_FSYNC', True)
 
-QUEUE_NUMBERS = {}
+_BACKEND = None
 
-def generate_queue_number():
-    return f"P-{random.randint(1000, 9999)}"
+def create_backend(name=QUEUE_BACKEND):
+    if name == 'redis':
+        return RedisQueueBackend.from_url(QUEUE_REDIS_URL)
+    if name == 'memory':
+        return InMemoryQueueBackend()
+    if name == 'journal':
+        backend = JournaledQueueBackend.open(QUEUE_JOURNAL_PATH, QUEUE_JOURNAL_SNAPSHOT_EVERY, QUEUE_JOURNAL_FSYNC)
+        # Commit whatever is still buffered on a clean shutdown.
+        atexit.register(backend.close)
+        return backend
+    raise ValueError(f"Unknown QUEUE_BACKEND {name!r}")
+
+def get_backend():
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = create_backend()
+    return _BACKEND
+
+def set_backend(backend):
+    global _BACKEND
+    _BACKEND = backend
+
+def get_specialties():
+    return get_backend().specialties()
 
 def add_to_queue(specialty, session_key):
-    if session_key not in QUEUE_NUMBERS:
-        queue_number = generate_queue_number()
-        while queue_number in QUEUE_NUMBERS.values():
-            queue_number = generate_queue_number()
-        QUEUE_NUMBERS[session_key] = queue_number
-    
-    queue = PATIENT_QUEUES.get(specialty)
-    if queue is not None and session_key not in queue:
-        queue.append(session_key)
-        return QUEUE_NUMBERS[session_key]
-    return QUEUE_NUMBERS.get(session_key)
+    with metrics.timed('queue.operation', op='enqueue'):
+        return get_backend().enqueue(specialty, session_key)
 
 def get_queue_position(specialty, session_key):
-    queue = PATIENT_QUEUES.get(specialty)
-    if queue and session_key in queue:
-        return list(queue).index(session_key) + 1
-    return -1
+    with metrics.timed('queue.operation', op='position'):
+        return get_backend().position(specialty, session_key)
+
+def get_queue_positions(specialty, session_keys):
+    """{session_key: 1-based position or -1} for many sessions at once."""
+    return get_backend().positions(specialty, session_keys)
 
 def get_queue_count(specialty):
-    queue = PATIENT_QUEUES.get(specialty)
-    return len(queue) if queue else 0
+    return get_backend().count(specialty)
+
+def get_queue_snapshot(specialty):
+    """Ordered [(session_key, queue_number), ...] for one specialty."""
+    with metrics.timed('queue.operation', op='snapshot'):
+        return get_backend().snapshot(specialty)
 
 def remove_from_queue(specialty):
-    queue = PATIENT_QUEUES.get(specialty)
-    if queue:
-        session_key = queue.popleft()
-        return session_key
-    return None
+    with metrics.timed('queue.operation', op='dequeue'):
+        return get_backend().dequeue(specialty)
 
 def get_queue_number(session_key):
-    return QUEUE_NUMBERS.get(session_key)
+    return get_backend().queue_number(session_key)
 
 def is_in_any_queue(session_key):
-    return any(session_key in q for q in PATIENT_QUEUES.values())
+    return get_backend().specialty_of(session_key) is not None
+
+def get_session_specialty(session_key):
+    return get_backend().specialty_of(session_key)
+
+def reset_queues():
+    get_backend().reset()
+
+# --- Async API for consumers ---
+# The in-memory backend answers in microseconds, so wrapping it in
+# sync_to_async costs more than the lookup. These run it directly on the
+# event loop and only hop to a thread for backends that do network I/O.
+# Async callers on one specialty are serialised by an asyncio lock, which
+# keeps multi-step reads (positions + total) consistent with each other.
+
+_SPECIALTY_LOCKS = weakref.WeakKeyDictionary()
+
+def specialty_lock(specialty):
+    # asyncio locks belong to one event loop, so keep a set per loop.
+    locks = _SPECIALTY_LOCKS.setdefault(asyncio.get_running_loop(), {})
+    lock = locks.get(specialty)
+    if lock is None:
+        lock = locks[specialty] = asyncio.Lock()
+    return lock
+
+async def _call(method, *args):
+    backend = get_backend()
+    func = getattr(backend, method)
+    with metrics.timed('queue.operation', op=method):
+        if backend.blocking:
+            return await sync_to_async(func, thread_sensitive=False)(*args)
+        return func(*args)
+
+async def aadd_to_queue(specialty, session_key):
+    async with specialty_lock(specialty):
+        return await _call('enqueue', specialty, session_key)
+
+async def aremove_from_queue(specialty):
+    async with specialty_lock(specialty):
+        return await _call('dequeue', specialty)
+
+async def aget_queue_position(specialty, session_key):
+    async with specialty_lock(specialty):
+        return await _call('position', specialty, session_key)
+
+async def aget_queue_count(specialty):
+    async with specialty_lock(specialty):
+        return await _call('count', specialty)
+
+async def aget_queue_status(specialty, session_keys):
+    """Positions for many sessions plus the queue length, read together."""
+    async with specialty_lock(specialty):
+        positions = await _call('positions', specialty, session_keys)
+        total = await _call('count', specialty)
+    return positions, total
+
+async def aget_queue_snapshot(specialty):
+    async with specialty_lock(specialty):
+        return await _call('snapshot', specialty)
+
+async def aget_queue_number(session_key):
+    return await _call('queue_number', session_key)
 
 def assign_specialty(symptoms):
     symptom_map = {
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import os
+import shutil
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .pathfinding import csr_distances_within, iter_csr_targets_by_distance
+
+FORMAT_VERSION = 1
+ARRAYS = ('node_ids', 'x', 'y', 'indptr', 'indices', 'lengths')
+
+
+def save_arrays(path, arrays, meta):
+    tmp_path = f"{path}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+        json.dump({'version': FORMAT_VERSION, **meta}, f)
+
+    # Swap the finished directory into place so readers never see a half-written graph.
+    old_path = f"{path}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+def load_arrays(path, names, mmap=True):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported array format version {meta.get('version')} in {path}")
+    mmap_mode = 'r' if mmap else None
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in names}
+
+
+def read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        return json.load(f)
+
+
+def array_store_exists(path):
+    return os.path.exists(os.path.join(path, 'meta.json'))
+
+
+def share_arrays(arrays):
+    """Copy arrays into one shared-memory block.
+
+    Returns the block and a picklable spec for attach_arrays. The caller owns
+    the block and must close() and unlink() it once no process needs it.
+    """
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        size = -(-size // 8) * 8  # keep every array 8-byte aligned
+        layout[name] = (array.dtype.str, array.shape, size)
+        size += array.nbytes
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    for name, array in arrays.items():
+        dtype, shape, offset = layout[name]
+        np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)[...] = array
+    return block, {'name': block.name, 'arrays': layout}
+
+
+def attach_arrays(spec):
+    """Read-only views of arrays in a block made by share_arrays."""
+    block = shared_memory.SharedMemory(name=spec['name'])
+    arrays = {}
+    for name, (dtype, shape, offset) in spec['arrays'].items():
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf, offset=offset)
+        array.flags.writeable = False
+        arrays[name] = array
+    return block, arrays
+
+
+class RoadGraph:
+    """Routing-only view of the road network: node coordinates plus a CSR
+    adjacency with edge lengths, stored as flat NumPy arrays.
+
+    `node_ids` is sorted, so OSM ids map to array positions with a binary
+    search. Saved graphs are loaded with mmap, which lets every worker share
+    the same pages through the OS page cache; graphs that were never saved
+    can be shared the same way with share() and attach().
+    """
+
+    def __init__(self, node_ids, x, y, indptr, indices, lengths):
+        self.node_ids = node_ids
+        self.x = x
+        self.y = y
+        self.indptr = indptr
+        self.indices = indices
+        self.lengths = lengths
+        self._snap_index = None
+        self._fingerprint = None
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    @classmethod
+    def from_networkx(cls, G, weight='length'):
+        node_ids = np.array(sorted(G.nodes), dtype=np.int64)
+        x = np.array([G.nodes[n]['x'] for n in node_ids.tolist()], dtype=np.float64)
+        y = np.array([G.nodes[n]['y'] for n in node_ids.tolist()], dtype=np.float64)
+
+        edges = [(u, v, data.get(weight, 1)) for u, v, data in G.edges(data=True)]
+        if not G.is_directed():
+            edges += [(v, u, w) for u, v, w in edges]
+        if edges:
+            us, vs, ws = zip(*edges)
+        else:
+            us, vs, ws = (), (), ()
+        src = np.searchsorted(node_ids, np.array(us, dtype=np.int64))
+        dst = np.searchsorted(node_ids, np.array(vs, dtype=np.int64))
+        lengths = np.array(ws, dtype=np.float64)
+
+        # Collapse parallel edges to the shortest one, as Dijkstra would.
+        order = np.lexsort((lengths, dst, src))
+        src, dst, lengths = src[order], dst[order], lengths[order]
+        keep = np.ones(len(src), dtype=bool)
+        keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        src, dst, lengths = src[keep], dst[keep], lengths[keep]
+
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=len(node_ids)), out=indptr[1:])
+        return cls(node_ids, x, y, indptr, dst.astype(np.int32), lengths)
+
+    @staticmethod
+    def exists(path):
+        return array_store_exists(path)
+
+    def fingerprint(self):
+        """Node count plus a checksum of the node ids and edges.
+
+        Stored in the meta.json of everything derived from this graph (CH,
+        nearest-pharmacy table) so a stale artifact can be recognised.
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for name in ('node_ids', 'indptr', 'indices', 'lengths'):
+                digest.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+            self._fingerprint = {'nodes': len(self), 'checksum': digest.hexdigest()}
+        return self._fingerprint
+
+    def save(self, path):
+        save_arrays(path, {name: getattr(self, name) for name in ARRAYS},
+                    {'nodes': len(self), 'edges': self.edge_count, 'graph': self.fingerprint()})
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        return cls(**load_arrays(path, ARRAYS, mmap))
+
+    def share(self):
+        """Copy into shared memory; returns (block, spec) for RoadGraph.attach."""
+        return share_arrays({name: getattr(self, name) for name in ARRAYS})
+
+    @classmethod
+    def attach(cls, spec):
+        block, arrays = attach_arrays(spec)
+        graph = cls(**arrays)
+        graph.shared_block = block  # the arrays are only valid while this stays open
+        return graph
+
+    def to_networkx(self):
+        import networkx as nx
+        G = nx.DiGraph()
+        node_ids = self.node_ids.tolist()
+        for node, x, y in zip(node_ids, self.x.tolist(), self.y.tolist()):
+            G.add_node(node, x=x, y=y)
+        indptr = self.indptr.tolist()
+        indices = self.indices.tolist()
+        lengths = self.lengths.tolist()
+        for u in range(len(node_ids)):
+            for e in range(indptr[u], indptr[u + 1]):
+                G.add_edge(node_ids[u], node_ids[indices[e]], length=lengths[e])
+        return G
+
+    def reversed(self):
+        n = len(self)
+        src = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+        order = np.argsort(self.indices, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=n), out=indptr[1:])
+        return RoadGraph(self.node_ids, self.x, self.y, indptr, src[order], np.asarray(self.lengths)[order])
+
+    def bounds(self):
+        return float(self.y.max()), float(self.y.min()), float(self.x.max()), float(self.x.min())
+
+    def index_of(self, node_ids):
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+        idx = np.searchsorted(self.node_ids, node_ids)
+        idx = np.minimum(idx, len(self.node_ids) - 1)
+        if not np.all(self.node_ids[idx] == node_ids):
+            raise KeyError(node_ids[self.node_ids[idx] != node_ids].tolist()[:5])
+        return idx
+
+    def _snap_coordinates(self):
+        # Equirectangular projection around the graph's mean latitude: within
+        # one city it ranks neighbours the same way great-circle distance does.
+        if self._snap_index is None:
+            coslat = np.cos(np.radians(float(np.mean(self.y))))
+            points = np.column_stack([np.asarray(self.x) * coslat, np.asarray(self.y)])
+            try:
+                from scipy.spatial import cKDTree
+                tree = cKDTree(points)
+            except ImportError:
+                tree = None
+            self._snap_index = (coslat, points, tree)
+        return self._snap_index
+
+    def nearest_nodes(self, X, Y):
+        """Drop-in for ox.nearest_nodes on an unprojected graph (X=lon, Y=lat).
+
+        All points are answered by one k-d tree query (built once per graph)
+        when scipy is installed, or by a linear scan per point otherwise.
+        """
+        scalar = np.isscalar(X)
+        coslat, points, tree = self._snap_coordinates()
+        xs = np.atleast_1d(np.asarray(X, dtype=np.float64)) * coslat
+        ys = np.atleast_1d(np.asarray(Y, dtype=np.float64))
+        if tree is not None:
+            _, idx = tree.query(np.column_stack([xs, ys]))
+        else:
+            # One point at a time keeps the scratch arrays in cache, which
+            # beats broadcasting blocks of points against every node.
+            idx = np.empty(len(xs), dtype=np.int64)
+            for i, (x, y) in enumerate(zip(xs, ys)):
+                dx = points[:, 0] - x
+                dy = points[:, 1] - y
+                idx[i] = np.argmin(dx * dx + dy * dy)
+        nearest = self.node_ids[idx]
+        return int(nearest[0]) if scalar else nearest
+
+    def iter_targets_by_distance(self, source, targets):
+        source_idx = int(self.index_of(source))
+        targets = list(targets)
+        target_idx = self.index_of(targets).tolist() if targets else []
+        for idx, distance in iter_csr_targets_by_distance(
+            self.indptr, self.indices, self.lengths, source_idx, target_idx
+        ):
+            yield int(self.node_ids[idx]), distance
+
+    def distances_within(self, source, max_distance):
+        """{node id: distance} for every node within `max_distance` of `source`."""
+        found = csr_distances_within(
+            self.indptr, self.indices, self.lengths, int(self.index_of(source)), max_distance
+        )
+        node_ids = self.node_ids
+        return {int(node_ids[idx]): distance for idx, distance in found.items()}
+
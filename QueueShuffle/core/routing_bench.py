@@ -0,0 +1,248 @@
+import json
+import math
+import random
+from pathlib import Path
+
+import geopandas as gpd
+import networkx as nx
+import osmnx as ox
+
+from . import pharmacy_routing
+from .bench import Stopwatch
+from .contraction import ContractionHierarchy
+from .pharmacy_table import NearestPharmacyTable
+from .road_graph import RoadGraph
+
+# --- Offline routing benchmark ---
+# Road graphs are either synthetic (jittered grids, random geometric graphs)
+# or built from Overpass responses in the osmnx cache folder, so nothing here
+# touches the network. Every strategy runs the same search/rank functions as
+# find_pharmacies_dijkstra_api against the same snapped user nodes.
+
+ORIGIN = (12.9, 77.5)  # lat, lon (Bengaluru)
+METRES_PER_DEGREE = 111_320
+EDGE_SPACING_M = 120
+DISTANCE_TOLERANCE = 1e-6
+
+# strategy -> (graph it runs on, search function)
+STRATEGIES = {
+    'pairwise': ('networkx', pharmacy_routing.search_pharmacies_pairwise),
+    'single_source': ('networkx', pharmacy_routing.search_pharmacies_single_source),
+    'single_source_csr': ('csr', pharmacy_routing.search_pharmacies_single_source),
+    'ch': ('csr', pharmacy_routing.search_pharmacies_ch),
+    'table': ('csr', pharmacy_routing.search_pharmacies_table),
+}
+
+
+def add_road_edge(G, u, v, rng, oneway_share=0.0):
+    # Roads are never straight, so stretch the great-circle length a little;
+    # that also keeps distances on a regular grid from tying.
+    nu, nv = G.nodes[u], G.nodes[v]
+    length = ox.distance.great_circle(nu['y'], nu['x'], nv['y'], nv['x']) * rng.uniform(1.0, 1.25)
+    G.add_edge(u, v, length=length)
+    if rng.random() >= oneway_share:
+        G.add_edge(v, u, length=length)
+
+
+def grid_graph(rows, cols, south, west, dlat, dlon, seed=0, oneway_share=0.05):
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for r in range(rows):
+        for c in range(cols):
+            G.add_node(
+                r * cols + c,
+                y=south + (r + rng.uniform(-0.2, 0.2)) * dlat,
+                x=west + (c + rng.uniform(-0.2, 0.2)) * dlon,
+            )
+    for r in range(rows):
+        for c in range(cols):
+            node = r * cols + c
+            if c + 1 < cols:
+                add_road_edge(G, node, node + 1, rng, oneway_share)
+            if r + 1 < rows:
+                add_road_edge(G, node, node + cols, rng, oneway_share)
+    return G
+
+
+def synthetic_grid(n, seed=0, spacing=EDGE_SPACING_M):
+    side = max(2, math.isqrt(n))
+    dlat = spacing / METRES_PER_DEGREE
+    dlon = spacing / (METRES_PER_DEGREE * math.cos(math.radians(ORIGIN[0])))
+    return grid_graph(side, side, ORIGIN[0], ORIGIN[1], dlat, dlon, seed)
+
+
+def random_geometric(n, seed=0, spacing=EDGE_SPACING_M, degree=6):
+    # Unit-square geometric graph with about `degree` neighbours per node,
+    # scaled so nodes sit roughly `spacing` metres apart.
+    rng = random.Random(seed)
+    U = nx.random_geometric_graph(n, math.sqrt(degree / (math.pi * n)), seed=seed)
+    side_m = spacing * math.sqrt(n)
+    dlat = side_m / METRES_PER_DEGREE
+    dlon = side_m / (METRES_PER_DEGREE * math.cos(math.radians(ORIGIN[0])))
+    G = nx.MultiDiGraph(crs='epsg:4326')
+    for node, (px, py) in U.nodes(data='pos'):
+        G.add_node(node, y=ORIGIN[0] + py * dlat, x=ORIGIN[1] + px * dlon)
+    for u, v in U.edges():
+        add_road_edge(G, u, v, rng)
+    return G
+
+
+def place_pharmacies(G, count, seed=0, unnamed_share=0.1):
+    """Pharmacy points scattered within ~50 m of random road nodes."""
+    rng = random.Random(seed)
+    nodes = rng.sample(list(G.nodes), min(count, len(G)))
+    offset = 50 / METRES_PER_DEGREE
+    xs = [G.nodes[n]['x'] + rng.uniform(-offset, offset) for n in nodes]
+    ys = [G.nodes[n]['y'] + rng.uniform(-offset, offset) for n in nodes]
+    names = [None if rng.random() < unnamed_share else f'Pharmacy {i}' for i in range(len(nodes))]
+    return pharmacy_frame(xs, ys, names)
+
+
+def pharmacy_frame(xs, ys, names):
+    return gpd.GeoDataFrame({'name': names}, geometry=gpd.points_from_xy(xs, ys), crs='epsg:4326')
+
+
+def read_overpass_responses(cache_dir):
+    for path in sorted(Path(cache_dir).glob('*.json')):
+        try:
+            response = json.loads(path.read_text())
+        except ValueError:
+            continue
+        if isinstance(response, dict) and response.get('elements'):
+            yield path.stem, response
+
+
+def cached_datasets(cache_dir, count, grid_nodes, seed=0):
+    """Up to `count` datasets from cached Overpass responses, largest first.
+
+    Responses with highway ways become real road graphs. Pharmacy-only
+    responses keep their real pharmacy locations and get a synthetic grid
+    laid over the area they cover.
+    """
+    candidates = []
+    for key, response in read_overpass_responses(cache_dir):
+        elements = response['elements']
+        pharmacies = [
+            e for e in elements
+            if e['type'] == 'node' and e.get('tags', {}).get('amenity') == 'pharmacy'
+        ]
+        roads = [e for e in elements if e['type'] == 'way' and 'highway' in e.get('tags', {})]
+        if len(pharmacies) >= 2:
+            candidates.append((len(roads), len(pharmacies), key, elements, pharmacies, roads))
+    candidates.sort(key=lambda c: (c[0], c[1]), reverse=True)
+
+    for _, _, key, elements, pharmacies, roads in candidates[:count]:
+        gdf = pharmacy_frame(
+            [e['lon'] for e in pharmacies],
+            [e['lat'] for e in pharmacies],
+            [e.get('tags', {}).get('name') for e in pharmacies],
+        )
+        if roads:
+            road_nodes = {n for way in roads for n in way['nodes']}
+            response = {'elements': [e for e in elements if e['type'] == 'node' and e['id'] in road_nodes] + roads}
+            G = ox.graph._create_graph([response], bidirectional=False)
+            yield f'cache:{key[:12]}', 'overpass_roads', G, gdf
+            continue
+
+        south, north = min(e['lat'] for e in pharmacies), max(e['lat'] for e in pharmacies)
+        west, east = min(e['lon'] for e in pharmacies), max(e['lon'] for e in pharmacies)
+        height = max(north - south, 1e-3)
+        width = max(east - west, 1e-3)
+        rows = max(2, round(math.sqrt(grid_nodes * height / width)))
+        cols = max(2, grid_nodes // rows)
+        G = grid_graph(rows, cols, south, west, height / (rows - 1), width / (cols - 1), seed)
+        yield f'cache:{key[:12]}', 'synthetic_grid', G, gdf
+
+
+def random_queries(road_graph, count, seed=0):
+    rng = random.Random(seed)
+    north, south, east, west = road_graph.bounds()
+    return [(rng.uniform(west, east), rng.uniform(south, north)) for _ in range(count)]
+
+
+def same_results(expected, actual):
+    if [r['name'] for r in expected] != [r['name'] for r in actual]:
+        return False
+    return all(
+        math.isclose(e['distance_numeric'], a['distance_numeric'], rel_tol=DISTANCE_TOLERANCE)
+        for e, a in zip(expected, actual)
+    )
+
+
+def benchmark_dataset(G, gdf, queries=50, strategies=tuple(STRATEGIES), limit=5, pairwise_queries=10, seed=0):
+    """Time snap/search/rank for each strategy on one graph and compare results."""
+    saved = (pharmacy_routing.CONTRACTION_HIERARCHY, pharmacy_routing.NEAREST_PHARMACY_TABLE,
+             pharmacy_routing.PHARMACY_CH_BUCKETS, pharmacy_routing.PHARMACY_TABLE_CURRENT)
+    prepare = Stopwatch()
+    try:
+        road_graph = prepare.time('road_graph', RoadGraph.from_networkx, G)
+        pharmacy_index = prepare.time('pharmacy_index', pharmacy_routing.build_pharmacy_index, road_graph, gdf)
+        if 'ch' in strategies:
+            ch = prepare.time('contraction_hierarchy', ContractionHierarchy.build, road_graph)
+            pharmacy_routing.CONTRACTION_HIERARCHY = ch
+            pharmacy_routing.PHARMACY_CH_BUCKETS = prepare.time('ch_buckets', ch.target_buckets, pharmacy_index)
+        if 'table' in strategies:
+            pharmacy_routing.NEAREST_PHARMACY_TABLE = prepare.time(
+                'pharmacy_table', NearestPharmacyTable.build, road_graph, pharmacy_index, limit
+            )
+            pharmacy_routing.PHARMACY_TABLE_CURRENT = True
+
+        graphs = {'networkx': G, 'csr': road_graph}
+        points = random_queries(road_graph, queries, seed)
+        # One snap shared by every strategy so results are comparable even
+        # where the graph types' nearest-node methods break ties differently.
+        user_nodes = [int(n) for n in road_graph.nearest_nodes([p[0] for p in points], [p[1] for p in points])]
+
+        report = {}
+        results = {}
+        for strategy in strategies:
+            graph_type, search = STRATEGIES[strategy]
+            graph = graphs[graph_type]
+            count = min(queries, pairwise_queries) if strategy == 'pairwise' else queries
+            watch = Stopwatch()
+            snap_error = None
+            results[strategy] = []
+            for (x, y), user_node in zip(points[:count], user_nodes):
+                if snap_error is None:
+                    try:
+                        watch.time('snap', pharmacy_routing.snap_to_graph, graph, x, y)
+                    except ImportError as e:
+                        # ox.nearest_nodes needs scikit-learn on unprojected graphs.
+                        snap_error = str(e)
+                hits = watch.time('search', search, graph, pharmacy_index, user_node, limit)
+                results[strategy].append(watch.time('rank', pharmacy_routing.rank_pharmacy_hits, pharmacy_index, hits, limit))
+            report[strategy] = {'graph': graph_type, 'queries': count, 'phases_ms': watch.summary()}
+            if snap_error:
+                report[strategy]['snap_error'] = snap_error
+
+        reference = strategies[0] if 'single_source_csr' not in strategies else 'single_source_csr'
+        for strategy in strategies:
+            mismatches = [
+                i for i, (expected, actual) in enumerate(zip(results[reference], results[strategy]))
+                if not same_results(expected, actual)
+            ]
+            report[strategy]['matches_reference'] = not mismatches
+            if mismatches:
+                report[strategy]['mismatched_queries'] = mismatches[:10]
+
+        return {
+            'nodes': len(road_graph),
+            'edges': int(road_graph.indptr[-1]),
+            'pharmacies': len(gdf),
+            'pharmacy_nodes': len(pharmacy_index),
+            'reference': reference,
+            'prepare_ms': {phase: s['total'] for phase, s in prepare.summary().items()},
+            'strategies': report,
+        }
+    finally:
+        (pharmacy_routing.CONTRACTION_HIERARCHY, pharmacy_routing.NEAREST_PHARMACY_TABLE,
+         pharmacy_routing.PHARMACY_CH_BUCKETS, pharmacy_routing.PHARMACY_TABLE_CURRENT) = saved
+
+
+def synthetic_datasets(kinds, sizes, pharmacy_share, seed=0):
+    builders = {'grid': synthetic_grid, 'geometric': random_geometric}
+    for kind in kinds:
+        for n in sizes:
+            G = builders[kind](n, seed)
+            gdf = place_pharmacies(G, max(2, int(len(G) * pharmacy_share)), seed)
+            yield f'{kind}:{n}', f'synthetic_{kind}', G, gdf
@@ -0,0 +1,226 @@
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# --- Pharmacy searches in a process pool ---
+# Searches are pure-Python loops that hold the GIL, so running them inside the
+# daphne process stalls every WebSocket on it. The async endpoint hands them
+# to worker processes instead. Each worker memory-maps the saved road graph
+# (plus CH and table, when built), so all of them share the same pages through
+# the OS page cache rather than holding their own copy. A graph that was built
+# in-process and never saved is copied once into shared memory instead.
+
+POOL_WORKERS = getattr(settings, 'ROUTING_POOL_WORKERS', None) or os.cpu_count() or 1
+# Requests allowed to run or wait for a worker at once; more get a 503.
+MAX_PENDING = getattr(settings, 'ROUTING_MAX_PENDING', 4 * POOL_WORKERS)
+TIMEOUT = getattr(settings, 'ROUTING_TIMEOUT_SECONDS', 10)
+
+_pool = None
+_pool_graph = None
+_pool_index = None
+_shared_block = None
+_pool_lock = threading.Lock()
+_pending = 0
+
+
+class RoutingBusy(Exception):
+    pass
+
+
+def _init_worker(paths, shared_graph, pharmacy_index):
+    # Runs once in each spawned worker. The parent already decided whether the
+    # graph is loaded, so skip the preload and warm-up and load exactly
+    # `paths`, or attach to the parent's shared-memory copy.
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthnav.settings')
+    os.environ['ROUTING_PRELOAD'] = '0'
+    os.environ['ROUTING_WARMUP'] = '0'
+    import django
+    django.setup()
+
+    from . import pharmacy_routing
+    (pharmacy_routing.ROAD_GRAPH_PATH,
+     pharmacy_routing.CONTRACTION_HIERARCHY_PATH,
+     pharmacy_routing.NEAREST_PHARMACY_TABLE_PATH) = paths
+    if shared_graph is not None:
+        pharmacy_routing.GRAPH_CACHE = pharmacy_routing.RoadGraph.attach(shared_graph)
+    elif pharmacy_routing.load_road_graph() is None:
+        raise RuntimeError(f'No saved road graph at {paths[0]}')
+    pharmacy_routing.set_pharmacy_index(pharmacy_index)
+
+
+def _search(user_point, mode):
+    from . import pharmacy_routing
+    return pharmacy_routing.nearest_pharmacies(
+        pharmacy_routing.GRAPH_CACHE, pharmacy_routing.PHARMACY_NODE_INDEX, user_point, mode
+    )
+
+
+def _distance_rows(user_nodes, k):
+    from . import pharmacy_routing
+    return [
+        pharmacy_routing.distance_row(pharmacy_routing.GRAPH_CACHE, pharmacy_routing.PHARMACY_NODE_INDEX, node, k)
+        for node in user_nodes
+    ]
+
+
+def _is_saved(G, path):
+    # RoadGraph.load memory-maps its arrays; anything else was built in-process.
+    import numpy as np
+    return bool(path) and isinstance(G.indptr, np.memmap)
+
+
+def get_pool(G, pharmacy_index):
+    """The shared pool, restarted when the graph or pharmacy index is rebuilt."""
+    global _pool, _pool_graph, _pool_index, _shared_block
+    from . import pharmacy_routing
+
+    with _pool_lock:
+        if _pool is None or _pool_graph is not G or _pool_index is not pharmacy_index:
+            _close_pool(wait=False)
+            paths = (pharmacy_routing.ROAD_GRAPH_PATH,
+                     pharmacy_routing.CONTRACTION_HIERARCHY_PATH,
+                     pharmacy_routing.NEAREST_PHARMACY_TABLE_PATH)
+            shared_graph = None
+            if not _is_saved(G, paths[0]):
+                _shared_block, shared_graph = G.share()
+            # spawn, not fork: forking a process that runs an event loop and
+            # threads is unsafe.
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(paths, shared_graph, pharmacy_index),
+            )
+            _pool_graph = G
+            _pool_index = pharmacy_index
+        return _pool
+
+
+def _close_pool(wait):
+    """Retire the current pool; without `wait`, in a background thread."""
+    global _pool, _pool_graph, _pool_index, _shared_block
+    pool, block = _pool, _shared_block
+    _pool = _pool_graph = _pool_index = _shared_block = None
+    if wait:
+        _retire(pool, block)
+        return None
+    thread = threading.Thread(target=_retire, args=(pool, block), name='routing-pool-retire', daemon=True)
+    thread.start()
+    return thread
+
+
+def _retire(pool, block):
+    # Workers are spawned lazily and attach to the block by name when they
+    # start, so it can only be unlinked once every one of them has exited.
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+    if block is not None:
+        block.close()
+        block.unlink()
+
+
+def shutdown():
+    with _pool_lock:
+        _close_pool(wait=True)
+
+
+def _prepare():
+    from . import pharmacy_routing
+    G = pharmacy_routing.get_graph()
+    return G, pharmacy_routing.get_pharmacy_index(G)
+
+
+async def nearest_pharmacies(user_point, mode):
+    """Run one pharmacy search off the event loop.
+
+    Raises RoutingBusy when MAX_PENDING requests are already in flight,
+    after TIMEOUT seconds, or when the pool is replaced under a queued
+    search. A timed-out search still finishes in its worker; only the
+    response is abandoned.
+    """
+    global _pending
+    from . import pharmacy_routing
+
+    if _pending >= MAX_PENDING:
+        raise RoutingBusy('Too many routing requests; try again shortly')
+    _pending += 1
+    try:
+        async with asyncio.timeout(TIMEOUT):
+            G, pharmacy_index = await sync_to_async(_prepare, thread_sensitive=False)()
+            if not isinstance(G, pharmacy_routing.RoadGraph):
+                # Only array graphs can be handed to the workers; search a
+                # networkx graph in a thread instead.
+                return await sync_to_async(pharmacy_routing.nearest_pharmacies, thread_sensitive=False)(
+                    G, pharmacy_index, user_point, mode
+                )
+            # Starting or replacing the pool can copy the graph into shared
+            # memory and wait on _pool_lock, so do it in a thread; only the
+            # submit happens on the loop.
+            pool = await sync_to_async(get_pool, thread_sensitive=False)(G, pharmacy_index)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, _search, user_point, mode)
+    except TimeoutError:
+        raise RoutingBusy(f'Routing took longer than {TIMEOUT} seconds; try again shortly') from None
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            raise  # The request itself was cancelled, e.g. the client left.
+        # Only the search was: the pool was replaced while it was queued.
+        raise RoutingBusy('The routing pool restarted; try again shortly') from None
+    finally:
+        _pending -= 1
+
+
+# Origins per pool task for the distance matrix: big enough to amortise the
+# round trip, small enough to spread a job over every worker.
+MATRIX_CHUNK = 16
+
+
+async def aiter_distance_rows(G, pharmacy_index, user_nodes, k=None):
+    """distance_row() for each user node, in order, as each chunk completes.
+
+    Chunks run in the pool with at most two per worker in flight, so memory
+    stays flat however many origins a job has, and the event loop is free
+    while they run.
+    """
+    from . import pharmacy_routing
+
+    chunks = (user_nodes[i:i + MATRIX_CHUNK] for i in range(0, len(user_nodes), MATRIX_CHUNK))
+    if not isinstance(G, pharmacy_routing.RoadGraph):
+        for chunk in chunks:
+            for row in await sync_to_async(_networkx_distance_rows, thread_sensitive=False)(G, pharmacy_index, chunk, k):
+                yield row
+        return
+
+    pool = await sync_to_async(get_pool, thread_sensitive=False)(G, pharmacy_index)
+    pending = deque(
+        asyncio.wrap_future(pool.submit(_distance_rows, chunk, k))
+        for chunk in itertools.islice(chunks, 2 * POOL_WORKERS)
+    )
+    try:
+        while pending:
+            try:
+                rows = await pending.popleft()
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                raise RoutingBusy('The routing pool restarted; try again shortly') from None
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(asyncio.wrap_future(pool.submit(_distance_rows, chunk, k)))
+            for row in rows:
+                yield row
+    finally:
+        # The client went away or a chunk failed: drop work nobody will read.
+        for future in pending:
+            future.cancel()
+
+
+def _networkx_distance_rows(G, pharmacy_index, user_nodes, k):
+    from . import pharmacy_routing
+    return [pharmacy_routing.distance_row(G, pharmacy_index, node, k) for node in user_nodes]
@@ -1,3 +1,1049 @@
-from django.test import TestCase
+import asyncio
+import concurrent.futures
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+from collections import deque
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+import networkx as nx
+from asgiref.sync import sync_to_async
+from channels.layers import channel_layers
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from .pathfinding import iter_targets_by_distance, nearest_targets
+from .road_graph import RoadGraph
+from .contraction import ContractionHierarchy, cross_check
+from .pharmacy_table import NearestPharmacyTable
+from .result_cache import LRUCache
+from .overpass_cache import OverpassCacheStore, cache_key
+from .indexed_queue import IndexedQueue
+from .queue_backends import JournaledQueueBackend, QueueNumberAllocator, QueueNumbersExhausted, RedisQueueBackend
+from . import metrics, pharmacy_routing, queue_manager, routing_bench, routing_pool, views, warmup
+from .routing import websocket_urlpatterns
+from .broadcasting import CoalescingScheduler
+
+
+def make_road_graph(n=200, seed=7):
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    for node in range(n):
+        G.add_node(node, x=77.5 + rng.random() * 0.1, y=12.9 + rng.random() * 0.1)
+    for u in range(n):
+        for v in rng.sample(range(n), 4):
+            if u != v:
+                G.add_edge(u, v, length=rng.uniform(10, 500))
+                G.add_edge(v, u, length=rng.uniform(10, 500))
+    return G
+
+
+class PathfindingTests(TestCase):
+    def setUp(self):
+        self.G = make_road_graph()
+
+    def test_targets_match_networkx_distances(self):
+        targets = set(range(0, 200, 7))
+        found = list(iter_targets_by_distance(self.G, 3, targets))
+        self.assertEqual({node for node, _ in found}, targets)
+        distances = [d for _, d in found]
+        self.assertEqual(distances, sorted(distances))
+        for node, distance in found:
+            self.assertAlmostEqual(distance, nx.dijkstra_path_length(self.G, 3, node, weight='length'))
+
+    def test_nearest_targets_stops_at_k(self):
+        targets = set(range(0, 200, 5))
+        self.assertEqual(nearest_targets(self.G, 3, targets, 5), list(iter_targets_by_distance(self.G, 3, targets))[:5])
+
+
+class RoadGraphTests(TestCase):
+    def setUp(self):
+        self.G = make_road_graph()
+
+    def test_csr_search_matches_networkx(self):
+        graph = RoadGraph.from_networkx(self.G)
+        targets = set(range(1, 200, 3))
+        expected = list(iter_targets_by_distance(self.G, 5, targets))
+        found = list(graph.iter_targets_by_distance(5, targets))
+        self.assertEqual([n for n, _ in found], [n for n, _ in expected])
+        for (_, a), (_, b) in zip(found, expected):
+            self.assertAlmostEqual(a, b)
+
+    def test_save_and_memory_map(self):
+        graph = RoadGraph.from_networkx(self.G)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/road_graph"
+            graph.save(path)
+            self.assertTrue(RoadGraph.exists(path))
+            loaded = RoadGraph.load(path)
+            self.assertEqual(len(loaded), len(graph))
+            self.assertEqual(loaded.edge_count, graph.edge_count)
+            self.assertEqual(loaded.nearest_nodes(self.G.nodes[42]['x'], self.G.nodes[42]['y']), 42)
+            self.assertEqual(
+                list(loaded.iter_targets_by_distance(0, [10, 20])),
+                list(graph.iter_targets_by_distance(0, [10, 20])),
+            )
+
+
+    def test_batch_snapping_matches_brute_force(self):
+        rng = random.Random(3)
+        xs = [77.5 + rng.random() * 0.1 for _ in range(50)]
+        ys = [12.9 + rng.random() * 0.1 for _ in range(50)]
+
+        lats = [self.G.nodes[n]['y'] for n in self.G.nodes]
+        coslat = math.cos(math.radians(sum(lats) / len(lats)))
+
+        def brute(x, y):
+            return min(self.G.nodes, key=lambda n: ((self.G.nodes[n]['x'] - x) * coslat) ** 2 + (self.G.nodes[n]['y'] - y) ** 2)
+
+        expected = [brute(x, y) for x, y in zip(xs, ys)]
+        self.assertEqual(RoadGraph.from_networkx(self.G).nearest_nodes(xs, ys).tolist(), expected)
+        with mock.patch.dict(sys.modules, {'scipy.spatial': None}):
+            graph = RoadGraph.from_networkx(self.G)
+            self.assertEqual(graph.nearest_nodes(xs, ys).tolist(), expected)
+            self.assertIsNone(graph._snap_coordinates()[2])
+
+    def test_shared_memory_round_trip(self):
+        graph = RoadGraph.from_networkx(self.G)
+        block, spec = graph.share()
+        self.addCleanup(block.unlink)
+        self.addCleanup(block.close)
+        shared = RoadGraph.attach(spec)
+        self.addCleanup(shared.shared_block.close)
+        self.assertFalse(shared.lengths.flags.writeable)
+        self.assertEqual(shared.edge_count, graph.edge_count)
+        self.assertEqual(
+            list(shared.iter_targets_by_distance(0, [10, 20])),
+            list(graph.iter_targets_by_distance(0, [10, 20])),
+        )
+
+
+class ContractionHierarchyTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.G = make_road_graph(n=120)
+        cls.ch = ContractionHierarchy.build(RoadGraph.from_networkx(cls.G))
+
+    def test_distances_match_dijkstra(self):
+        self.assertEqual(cross_check(self.ch, self.G, samples=20), [])
+
+    def test_nearest_targets_match_single_source_search(self):
+        targets = list(range(0, 120, 4))
+        buckets = self.ch.target_buckets(targets)
+        for source in (1, 50, 99):
+            expected = nearest_targets(self.G, source, set(targets), 5)
+            found = self.ch.nearest_targets(source, buckets, 5)
+            self.assertEqual([round(d, 6) for _, d in found], [round(d, 6) for _, d in expected])
+
+
+class NearestPharmacyTableTests(TestCase):
+    def test_lookup_matches_single_source_search(self):
+        G = make_road_graph()
+        pharmacies = set(range(3, 200, 11))
+        table = NearestPharmacyTable.build(RoadGraph.from_networkx(G), pharmacies, 4)
+        self.assertTrue(table.matches(pharmacies))
+        self.assertFalse(table.matches(pharmacies | {0}))
+        for source in (0, 57, 123):
+            expected = nearest_targets(G, source, pharmacies, 4)
+            found = table.lookup(source)
+            self.assertEqual([n for n, _ in found], [n for n, _ in expected])
+            for (_, a), (_, b) in zip(found, expected):
+                self.assertAlmostEqual(a, b)
+
+
+class PharmacyIndexTests(TestCase):
+    def test_groups_pharmacies_by_nearest_node(self):
+        import geopandas as gpd
+        from shapely.geometry import Point
+
+        G = nx.MultiDiGraph()
+        G.add_node(1, x=77.50, y=12.90)
+        G.add_node(2, x=77.60, y=12.90)
+        G.add_edge(1, 2, length=1000.0)
+        gdf = gpd.GeoDataFrame(
+            {'name': ['Apollo', None, 'MedPlus']},
+            geometry=[Point(77.501, 12.901), Point(77.499, 12.899), Point(77.599, 12.90)],
+            crs='epsg:4326',
+        )
+        index = pharmacy_routing.build_pharmacy_index(RoadGraph.from_networkx(G), gdf)
+        self.assertEqual(index, {1: ['Apollo', 'Unnamed Pharmacy'], 2: ['MedPlus']})
+        self.assertEqual(pharmacy_routing.build_pharmacy_index(G, gdf.iloc[:0]), {})
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_entries_expire_after_ttl(self):
+        now = [0.0]
+        cache = LRUCache(maxsize=10, ttl=5, clock=lambda: now[0])
+        cache.set('a', 1)
+        now[0] = 4.9
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 5.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_clear_invalidates(self):
+        cache = LRUCache(maxsize=10)
+        cache.set('a', 1)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+
+
+class OverpassCacheStoreTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / 'osm_cache.sqlite3'
+
+    def test_round_trip_by_url_key(self):
+        store = OverpassCacheStore(self.path)
+        key = cache_key('https://overpass-api.de/api/interpreter?data=x')
+        self.assertIsNone(store.get(key))
+        store.put(key, {'elements': [{'id': 1}]})
+        self.assertEqual(OverpassCacheStore(self.path).get(key), {'elements': [{'id': 1}]})
+
+    def test_imports_osmnx_json_files(self):
+        legacy = Path(self.tmp.name) / 'cache'
+        legacy.mkdir()
+        key = cache_key('https://example.org/q')
+        (legacy / f'{key}.json').write_text(json.dumps({'elements': []}))
+        (legacy / 'broken.json').write_text('{')
+        store = OverpassCacheStore(self.path)
+        self.assertEqual(store.import_directory(legacy), (1, 1))
+        self.assertEqual(store.import_directory(legacy), (0, 2))
+        self.assertEqual(store.get(key), {'elements': []})
+
+    def test_evicts_least_recently_read_over_budget(self):
+        store = OverpassCacheStore(self.path)
+        for i in range(5):
+            store.put(f'k{i}', {'elements': list(range(i * 50, i * 50 + 200))})
+        store.get('k0')
+        store.max_bytes = store.total_bytes() // 2
+        store.compact()
+        self.assertLessEqual(store.total_bytes(), store.max_bytes)
+        self.assertIn('k0', store)
+        self.assertNotIn('k1', store)
+
+
+class IndexedQueueTests(TestCase):
+    def test_matches_deque_under_random_operations(self):
+        rng = random.Random(0)
+        queue, expected = IndexedQueue(), deque()
+        for n in range(5000):
+            op = rng.random()
+            if op < 0.5:
+                queue.append(f's{n}')
+                expected.append(f's{n}')
+            elif op < 0.8 and expected:
+                self.assertEqual(queue.popleft(), expected.popleft())
+            elif op < 0.9 and expected:
+                key = rng.choice(expected)
+                queue.remove(key)
+                expected.remove(key)
+            elif expected:
+                key = rng.choice(expected)
+                self.assertEqual(queue.position(key), list(expected).index(key) + 1)
+            self.assertEqual(len(queue), len(expected))
+        self.assertEqual(list(queue), list(expected))
+
+    def test_missing_key(self):
+        queue = IndexedQueue(['a'])
+        self.assertEqual(queue.position('b'), -1)
+        self.assertNotIn('b', queue)
+        with self.assertRaises(IndexError):
+            IndexedQueue().popleft()
+
+
+class QueueManagerTests(TestCase):
+    def setUp(self):
+        queue_manager.reset_queues()
+        self.addCleanup(queue_manager.reset_queues)
+
+    def test_positions_follow_queue_order(self):
+        for key in ('a', 'b', 'c'):
+            queue_manager.add_to_queue('Cardiology', key)
+        self.assertEqual(queue_manager.get_queue_position('Cardiology', 'c'), 3)
+        self.assertEqual(queue_manager.remove_from_queue('Cardiology'), 'a')
+        self.assertEqual(queue_manager.get_queue_position('Cardiology', 'c'), 2)
+        self.assertEqual(queue_manager.get_queue_position('Cardiology', 'a'), -1)
+        self.assertEqual(queue_manager.get_queue_position('Dermatology', 'c'), -1)
+        self.assertEqual(queue_manager.get_queue_count('Cardiology'), 2)
+
+    def test_membership_index(self):
+        queue_manager.add_to_queue('Neurology', 'a')
+        self.assertTrue(queue_manager.is_in_any_queue('a'))
+        self.assertEqual(queue_manager.get_session_specialty('a'), 'Neurology')
+        # Already queued elsewhere: keeps the original queue and number.
+        number = queue_manager.get_queue_number('a')
+        self.assertEqual(queue_manager.add_to_queue('Cardiology', 'a'), number)
+        self.assertEqual(queue_manager.get_queue_count('Cardiology'), 0)
+        queue_manager.remove_from_queue('Neurology')
+        self.assertFalse(queue_manager.is_in_any_queue('a'))
+
+    def test_queue_numbers_are_unique_and_recycled(self):
+        numbers = {queue_manager.add_to_queue('Cardiology', f's{i}') for i in range(500)}
+        self.assertEqual(len(numbers), 500)
+        self.assertTrue(all(n.startswith('P-') and 1000 <= int(n[2:]) <= 9999 for n in numbers))
+        first = queue_manager.get_queue_number('s0')
+        queue_manager.remove_from_queue('Cardiology')
+        self.assertIsNone(queue_manager.get_queue_number('s0'))
+        backend = queue_manager.get_backend()
+        self.assertEqual(len(backend.allocator), 9000 - 499)
+        self.assertNotIn(first, backend.queue_numbers.values())
+
+    def test_sync_writes_and_loop_reads_stay_consistent(self):
+        # Views mutate on Django's sync thread while consumers read on the
+        # event loop; a read must never see a half-rebuilt IndexedQueue.
+        keys = [f's{i}' for i in range(300)]
+        stop = threading.Event()
+
+        def churn():
+            i = 0
+            while not stop.is_set():
+                queue_manager.add_to_queue('Cardiology', keys[i % len(keys)])
+                if i % 3:
+                    queue_manager.remove_from_queue('Cardiology')
+                i += 1
+
+        writer = threading.Thread(target=churn)
+        writer.start()
+        try:
+            for _ in range(2000):
+                positions = [p for p in queue_manager.get_queue_positions('Cardiology', keys).values() if p != -1]
+                self.assertEqual(sorted(positions), list(range(1, len(positions) + 1)))
+        finally:
+            stop.set()
+            writer.join()
+
+
+class QueueNumberAllocatorTests(TestCase):
+    def test_reports_exhaustion(self):
+        allocator = QueueNumberAllocator(1000, 1002)
+        numbers = [allocator.allocate() for _ in range(3)]
+        self.assertEqual(sorted(numbers), ['P-1000', 'P-1001', 'P-1002'])
+        with self.assertRaises(QueueNumbersExhausted):
+            allocator.allocate()
+        allocator.release(numbers[1])
+        self.assertEqual(allocator.allocate(), numbers[1])
+
+
+class JournaledQueueBackendTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = tmp.name
+
+    def reopen(self, backend, **kwargs):
+        backend.close()
+        backend = JournaledQueueBackend.open(self.path, fsync=False, **kwargs)
+        self.addCleanup(backend.close)
+        return backend
+
+    def test_restart_restores_queues_and_numbers(self):
+        backend = JournaledQueueBackend.open(self.path, fsync=False)
+        numbers = {key: backend.enqueue('Cardiology', key) for key in ('a', 'b', 'c')}
+        backend.enqueue('Neurology', 'd')
+        backend.dequeue('Cardiology')
+        before = {s: backend.snapshot(s) for s in backend.specialties()}
+
+        backend = self.reopen(backend)
+        self.assertEqual({s: backend.snapshot(s) for s in backend.specialties()}, before)
+        self.assertEqual(backend.queue_number('c'), numbers['c'])
+        self.assertEqual(backend.position('Cardiology', 'c'), 2)
+        self.assertIsNone(backend.specialty_of('a'))
+        in_use = {number for _, number in before['Cardiology'] + before['Neurology']}
+        self.assertNotIn(backend.enqueue('General Physician', 'e'), in_use)
+
+    def test_snapshots_compact_the_journal(self):
+        backend = JournaledQueueBackend.open(self.path, snapshot_every=25, fsync=False)
+        rng = random.Random(1)
+        for i in range(300):
+            if rng.random() < 0.6:
+                backend.enqueue(rng.choice(backend.specialties()), f'p{i}')
+            else:
+                backend.dequeue(rng.choice(backend.specialties()))
+        self.assertTrue(backend.journal.flush(5))
+        before = {s: backend.snapshot(s) for s in backend.specialties()}
+
+        backend = self.reopen(backend, snapshot_every=25)
+        self.assertEqual({s: backend.snapshot(s) for s in backend.specialties()}, before)
+        self.assertEqual(len([n for n in os.listdir(self.path) if n.endswith('.log')]), 1)
+
+        backend.reset()
+        backend = self.reopen(backend)
+        self.assertEqual(backend.count('Cardiology'), 0)
+
+    def test_torn_last_record_is_ignored(self):
+        backend = JournaledQueueBackend.open(self.path, fsync=False)
+        backend.enqueue('Cardiology', 'a')
+        backend.close()
+        with open(os.path.join(self.path, 'journal-00000000.log'), 'a') as f:
+            f.write('["e","Cardiology","b"')
+        backend = self.reopen(backend)
+        self.assertEqual([key for key, _ in backend.snapshot('Cardiology')], ['a'])
+
+        # Records written after recovery must not be glued onto the torn line.
+        backend.enqueue('Cardiology', 'x')
+        backend.enqueue('Cardiology', 'y')
+        backend = self.reopen(backend)
+        self.assertEqual([key for key, _ in backend.snapshot('Cardiology')], ['a', 'x', 'y'])
+
+    def test_valid_record_missing_its_newline_is_kept(self):
+        backend = JournaledQueueBackend.open(self.path, fsync=False)
+        backend.enqueue('Cardiology', 'a')
+        backend.close()
+        with open(os.path.join(self.path, 'journal-00000000.log'), 'a') as f:
+            f.write('["e","Cardiology","b","P-1234"]')
+        backend = self.reopen(backend)
+        backend.enqueue('Cardiology', 'c')
+        backend = self.reopen(backend)
+        self.assertEqual([key for key, _ in backend.snapshot('Cardiology')], ['a', 'b', 'c'])
+
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@skipIf(fakeredis is None, 'fakeredis is not installed')
+class RedisQueueBackendTests(SimpleTestCase):
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        # Two backends on one server stand in for two worker processes.
+        self.workers = [
+            RedisQueueBackend(fakeredis.FakeRedis(server=server, decode_responses=True))
+            for _ in range(2)
+        ]
+
+    def test_workers_share_one_queue(self):
+        first, second = self.workers
+        number = first.enqueue('Cardiology', 'a')
+        second.enqueue('Cardiology', 'b')
+        self.assertEqual(second.enqueue('Neurology', 'a'), number)
+        self.assertEqual(second.position('Cardiology', 'b'), 2)
+        self.assertEqual(first.snapshot('Cardiology'), [('a', number), ('b', second.queue_number('b'))])
+        self.assertEqual(second.dequeue('Cardiology'), 'a')
+        self.assertEqual(first.position('Cardiology', 'b'), 1)
+        self.assertIsNone(first.specialty_of('a'))
+        self.assertEqual(first.count('Neurology'), 0)
+        self.assertEqual(first.position('Dermatology', 'b'), -1)
+        self.assertEqual(second.positions('Cardiology', ['b', 'a', None]), {'b': 1, 'a': -1, None: -1})
+
+    def test_snapshot_reads_the_whole_queue_at_once(self):
+        first, second = self.workers
+        self.assertEqual(first.snapshot('Cardiology'), [])
+        keys = [f's{i}' for i in range(2500)]
+        for key in keys:
+            second.enqueue('Cardiology', key)
+        snapshot = first.snapshot('Cardiology')
+        self.assertEqual([key for key, _ in snapshot], keys)
+        self.assertEqual([number for _, number in snapshot], [second.queue_number(key) for key in keys])
+
+    def test_numbers_are_unique_and_recycled(self):
+        first, second = self.workers
+        numbers = {self.workers[i % 2].enqueue('General Physician', f's{i}') for i in range(200)}
+        self.assertEqual(len(numbers), 200)
+        released = first.queue_number('s0')
+        first.dequeue('General Physician')
+        self.assertIsNone(second.queue_number('s0'))
+        # Recycled numbers go to the back of the shared pool.
+        self.assertEqual(first.client.lindex(first._key('pool'), -1), released)
+        self.assertEqual(first.client.llen(first._key('pool')), 9000 - 199)
+
+    def test_reports_exhaustion(self):
+        first = self.workers[0]
+        first.client.delete(first._key('pool'))
+        with self.assertRaises(QueueNumbersExhausted):
+            first.enqueue('Cardiology', 'a')
+        self.assertEqual(first.count('Cardiology'), 0)
+
+
+IN_MEMORY_CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_CHANNEL_LAYERS)
+class QueueBroadcastTests(SimpleTestCase):
+    def setUp(self):
+        channel_layers.backends.clear()
+        queue_manager.reset_queues()
+        self.addCleanup(queue_manager.reset_queues)
+        self.addCleanup(channel_layers.backends.clear)
+
+    async def connect_patient(self, session_key):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/queue/Cardiology/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.send_json_to({'action': 'get_position', 'session_key': session_key})
+        await communicator.receive_json_from()
+        return communicator
+
+    def test_snapshot_event_is_one_ordered_list(self):
+        for key in ('a', 'b'):
+            queue_manager.add_to_queue('Cardiology', key)
+        self.assertEqual(views.queue_snapshot_event('Cardiology'), {
+            'type': 'queue_update',
+            'total': 2,
+            'queue': [['a', queue_manager.get_queue_number('a')], ['b', queue_manager.get_queue_number('b')]],
+        })
+
+    async def test_snapshot_sends_one_personal_message_per_socket(self):
+        for key in ('a', 'b', 'c'):
+            queue_manager.add_to_queue('Cardiology', key)
+        sockets = {key: await self.connect_patient(key) for key in ('a', 'c', 'gone')}
+
+        await sync_to_async(views.broadcast_queue_update)('Cardiology')
+
+        message = await sockets['c'].receive_json_from()
+        self.assertEqual((message['session_key'], message['position'], message['total']), ('c', 3, 3))
+        self.assertEqual(message['queue_number'], queue_manager.get_queue_number('c'))
+        self.assertEqual((await sockets['a'].receive_json_from())['position'], 1)
+        self.assertEqual(await sockets['gone'].receive_json_from(), {'type': 'queue_update', 'total': 3})
+        for communicator in sockets.values():
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+
+    async def test_scheduled_updates_reach_sockets_once_per_window(self):
+        socket = await self.connect_patient('a')
+        scheduler = CoalescingScheduler(views.abroadcast_queue_update, window=0.05)
+        with mock.patch.object(views, 'QUEUE_BROADCAST_SCHEDULER', scheduler), \
+                mock.patch.object(views, 'QUEUE_BROADCAST_WINDOW', 0.05):
+            for key in ('a', 'b', 'c'):
+                # The way a view runs under ASGI: sync code in a worker thread.
+                await sync_to_async(queue_manager.add_to_queue)('Cardiology', key)
+                await sync_to_async(views.schedule_queue_update)('Cardiology')
+            message = await socket.receive_json_from(timeout=3)
+        self.assertEqual((message['position'], message['total']), (1, 3))
+        self.assertTrue(await socket.receive_nothing(timeout=0.2))
+        self.assertEqual((scheduler.requested, scheduler.sent), (3, 1))
+        await socket.disconnect()
+
+    async def test_batched_positions(self):
+        for key in ('a', 'b', 'c'):
+            await queue_manager.aadd_to_queue('Cardiology', key)
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/queue/Cardiology/')
+        await communicator.connect()
+        await communicator.send_json_to({'action': 'get_positions', 'session_keys': ['c', 'a', 'gone']})
+        message = await communicator.receive_json_from()
+        self.assertEqual(message, {
+            'type': 'positions_update',
+            'positions': {'c': 3, 'a': 1, 'gone': -1},
+            'total': 3,
+        })
+        await communicator.send_json_to({'action': 'get_positions', 'session_keys': 'a'})
+        self.assertEqual((await communicator.receive_json_from())['type'], 'error')
+        await communicator.disconnect()
+
+    async def test_async_api_serialises_per_specialty(self):
+        keys = [f's{i}' for i in range(50)]
+        numbers = await asyncio.gather(*(queue_manager.aadd_to_queue('Neurology', key) for key in keys))
+        self.assertEqual(len(set(numbers)), 50)
+        positions, total = await queue_manager.aget_queue_status('Neurology', keys)
+        self.assertEqual(sorted(positions.values()), list(range(1, 51)))
+        self.assertEqual(total, 50)
+        self.assertEqual(await queue_manager.aremove_from_queue('Neurology'), 's0')
+        self.assertEqual(await queue_manager.aget_queue_position('Neurology', 's1'), 1)
+
+
+class QueueBenchmarkTests(SimpleTestCase):
+    def test_small_run_reports_every_update(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / 'queue.json'
+            call_command('bench_queue', patients=6, doctors=1, output=str(output), stdout=StringIO(), stderr=StringIO())
+            report = json.loads(output.read_text())
+        self.assertEqual(report['connections'], 9)
+        for phase in report['phases'].values():
+            self.assertEqual(phase['changes'], 6)
+            self.assertEqual(phase['sockets_missing_final_state'], 0)
+            self.assertEqual(phase['latency_ms']['count'], phase['messages'])
+            self.assertEqual(phase['messages_per_client']['count'], 9)
+            self.assertLessEqual(phase['broadcasts'], phase['changes'])
+            self.assertGreater(phase['delivery_ms']['count'], 0)
+
+    def test_zero_window_sends_every_change(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = Path(tmp) / 'queue.json'
+            call_command('bench_queue', patients=6, doctors=1, window_ms=0, output=str(output),
+                         stdout=StringIO(), stderr=StringIO())
+            report = json.loads(output.read_text())
+        join = report['phases']['join']
+        self.assertEqual(join['broadcasts'], 6)
+        # Every socket in a specialty sees each of its two joins.
+        self.assertEqual(join['messages_per_client']['max'], 2)
+
+
+class RoutingBenchmarkTests(SimpleTestCase):
+    def test_strategies_agree_on_synthetic_graphs(self):
+        for G in (routing_bench.synthetic_grid(150, seed=3), routing_bench.random_geometric(150, seed=3)):
+            gdf = routing_bench.place_pharmacies(G, 12, seed=3)
+            result = routing_bench.benchmark_dataset(G, gdf, queries=8, pairwise_queries=2)
+            for strategy, stats in result['strategies'].items():
+                self.assertTrue(stats['matches_reference'], strategy)
+                self.assertEqual(set(stats['phases_ms']), {'snap', 'search', 'rank'})
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        queue_manager.reset_queues()
+        self.addCleanup(queue_manager.reset_queues)
+
+    def test_disabled_records_nothing(self):
+        with mock.patch.object(metrics, 'ENABLED', False):
+            queue_manager.add_to_queue('Cardiology', 'a')
+            metrics.increment('ws.connections')
+            self.assertIs(metrics.timed('x'), metrics.timed('y'))
+            response = views.metrics_view(RequestFactory().get('/metrics/'))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(metrics.snapshot()['counters'], {})
+        self.assertEqual(metrics.snapshot()['histograms'], {})
+
+    def test_queue_operations_and_endpoint(self):
+        with mock.patch.object(metrics, 'ENABLED', True):
+            for key in ('a', 'b'):
+                queue_manager.add_to_queue('Cardiology', key)
+            queue_manager.remove_from_queue('Cardiology')
+            metrics.observe('queue.broadcast_fanout', 3, buckets=metrics.SIZE_BUCKETS)
+            response = views.metrics_view(RequestFactory().get('/metrics/'))
+            text = views.metrics_view(RequestFactory().get('/metrics/', {'format': 'prometheus'})).content.decode()
+
+        data = json.loads(response.content)
+        operations = {s['labels']['op']: s for s in data['histograms']['queue.operation']}
+        self.assertEqual(operations['enqueue']['count'], 2)
+        self.assertEqual(operations['dequeue']['count'], 1)
+        self.assertEqual(operations['enqueue']['buckets']['+Inf'], 2)
+        fanout = data['histograms']['queue.broadcast_fanout'][0]['buckets']
+        self.assertEqual((fanout['2'], fanout['5']), (0, 1))
+        self.assertIn('queue_operation_count{op="enqueue",pid="%d"} 2' % data['pid'], text)
+
+
+class SavedGraphTestCase(SimpleTestCase):
+    """A 200-node road graph saved to disk and loaded as the routing graph."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = f"{tmp.name}/road_graph"
+        graph = RoadGraph.from_networkx(make_road_graph())
+        graph.save(path)
+
+        saved = {name: getattr(pharmacy_routing, name) for name in (
+            'GRAPH_CACHE', 'ROAD_GRAPH_PATH', 'CONTRACTION_HIERARCHY_PATH',
+            'NEAREST_PHARMACY_TABLE_PATH', 'PHARMACY_CACHE', 'PHARMACY_NODE_INDEX',
+        )}
+        self.addCleanup(lambda: [setattr(pharmacy_routing, k, v) for k, v in saved.items()])
+        self.addCleanup(pharmacy_routing.set_pharmacy_index, saved['PHARMACY_NODE_INDEX'])
+        self.addCleanup(routing_pool.shutdown)
+
+        pharmacy_routing.ROAD_GRAPH_PATH = path
+        pharmacy_routing.CONTRACTION_HIERARCHY_PATH = None
+        pharmacy_routing.NEAREST_PHARMACY_TABLE_PATH = None
+        pharmacy_routing.GRAPH_CACHE = RoadGraph.load(path)
+        pharmacy_routing.PHARMACY_CACHE = 'loaded'
+        pharmacy_routing.set_pharmacy_index({node: [f'Pharmacy {node}'] for node in range(5, 200, 9)})
+
+
+class RoutingPoolTests(SavedGraphTestCase):
+    def test_pool_results_match_sync_endpoint(self):
+        request = RequestFactory().get('/api/', {'lat': '12.95', 'lon': '77.55'})
+        expected = json.loads(views.find_pharmacies_dijkstra_api(request).content)
+        with mock.patch.object(routing_pool, 'POOL_WORKERS', 1):
+            response = asyncio.run(views.find_pharmacies_async_api(request))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), expected)
+        self.assertEqual(len(expected['pharmacies']), 5)
+
+    def test_pool_is_created_off_the_event_loop(self):
+        request = RequestFactory().get('/api/', {'lat': '12.95', 'lon': '77.55'})
+        threads = []
+        real_get_pool = routing_pool.get_pool
+
+        def get_pool(*args):
+            threads.append(threading.current_thread())
+            return real_get_pool(*args)
+
+        async def call():
+            threads.append(threading.current_thread())
+            return await views.find_pharmacies_async_api(request)
+
+        with mock.patch.object(routing_pool, 'POOL_WORKERS', 1), mock.patch.object(routing_pool, 'get_pool', get_pool):
+            response = asyncio.run(call())
+        self.assertEqual(response.status_code, 200)
+        loop_thread, pool_thread = threads
+        self.assertIsNot(pool_thread, loop_thread)
+
+    def test_downloaded_graph_is_slimmed_and_shared_with_workers(self):
+        request = RequestFactory().get('/api/', {'lat': '12.95', 'lon': '77.55'})
+        expected = json.loads(views.find_pharmacies_dijkstra_api(request).content)
+
+        pharmacy_routing.GRAPH_CACHE = None
+        pharmacy_routing.ROAD_GRAPH_PATH = None
+        with mock.patch.object(pharmacy_routing.ox, 'graph_from_place', return_value=make_road_graph()), \
+                mock.patch.object(warmup, 'GRAPH', warmup.SingleFlight('graph')):
+            G = pharmacy_routing.get_graph()
+        self.assertIsInstance(G, RoadGraph)
+
+        with mock.patch.object(routing_pool, 'POOL_WORKERS', 1):
+            response = asyncio.run(views.find_pharmacies_async_api(request))
+        self.assertIsNotNone(routing_pool._shared_block)
+        self.assertEqual(json.loads(response.content), expected)
+
+    def distances(self, body):
+        request = RequestFactory().post('/api/pharmacy_distances/', json.dumps(body), content_type='application/json')
+        response = views.pharmacy_distances_api(request)
+        if not response.streaming:
+            return response.status_code, json.loads(response.content)
+        # Read it the way the ASGI handler does, through __aiter__.
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return [chunk async for chunk in response]
+
+        return response.status_code, [json.loads(line) for line in b''.join(asyncio.run(read())).splitlines()]
+
+    def test_distance_matrix_streams_rows_from_the_pool(self):
+        origins = [[12.90 + i * 0.004, 77.51 + i * 0.003] for i in range(40)]
+        G = pharmacy_routing.GRAPH_CACHE
+        index = pharmacy_routing.PHARMACY_NODE_INDEX
+        with mock.patch.object(routing_pool, 'POOL_WORKERS', 2):
+            status, lines = self.distances({'origins': origins})
+            _, top = self.distances({'origins': origins, 'k': 3})
+        self.assertEqual(status, 200)
+
+        header, rows = lines[0], lines[1:]
+        self.assertEqual([c['node'] for c in header['pharmacies']], list(index))
+        self.assertEqual([r['origin'] for r in rows], list(range(40)))
+        for origin, row, ranked in zip(origins, rows, top):
+            node = G.nearest_nodes(origin[1], origin[0])
+            self.assertEqual(row['node'], node)
+            expected = dict(G.iter_targets_by_distance(node, index))
+            self.assertEqual(row['distances'], [round(expected[n], 1) if n in expected else None for n in index])
+            self.assertEqual(ranked['pharmacies'], pharmacy_routing.distance_row(G, index, node, 3)['pharmacies'])
+            self.assertEqual(len(ranked['pharmacies']), 3)
+
+    def test_distance_rows_are_sent_as_chunks_complete(self):
+        origins = [[12.90 + i * 0.001, 77.51 + i * 0.001] for i in range(5 * routing_pool.MATRIX_CHUNK)]
+        request = RequestFactory().post('/api/pharmacy_distances/', json.dumps({'origins': origins, 'k': 1}),
+                                        content_type='application/json')
+        submitted = []
+        real_submit = concurrent.futures.ProcessPoolExecutor.submit
+
+        def submit(pool, fn, *args):
+            submitted.append(args)
+            return real_submit(pool, fn, *args)
+
+        async def first_row():
+            stream = aiter(views.pharmacy_distances_api(request))
+            row = json.loads(await anext(stream))
+            # The first row is out while most chunks are still unsubmitted;
+            # closing the stream drops them.
+            await stream.aclose()
+            return row
+
+        with mock.patch.object(routing_pool, 'POOL_WORKERS', 1), \
+                mock.patch.object(concurrent.futures.ProcessPoolExecutor, 'submit', submit):
+            row = asyncio.run(first_row())
+        self.assertEqual(row['origin'], 0)
+        self.assertEqual(len(submitted), 3)
+
+    def test_distance_request_validation(self):
+        self.assertEqual(self.distances({'origins': []})[0], 400)
+        self.assertEqual(self.distances({'origins': [['a', 1]]})[0], 400)
+        self.assertEqual(self.distances({'origins': [[12.9, 77.5]], 'k': 0})[0], 400)
+        get = views.pharmacy_distances_api(RequestFactory().get('/api/pharmacy_distances/'))
+        self.assertEqual(get.status_code, 405)
+
+    def test_timeout_and_restarted_pool_answer_503(self):
+        request = RequestFactory().get('/api/', {'lat': '12.95', 'lon': '77.55'})
+        with mock.patch.object(routing_pool, 'TIMEOUT', 0):
+            slow = asyncio.run(views.find_pharmacies_async_api(request))
+        self.assertEqual(slow.status_code, 503)
+
+        class RestartedPool(concurrent.futures.Executor):
+            # What a queued search sees when get_pool replaces the pool.
+            def submit(self, fn, *args, **kwargs):
+                future = concurrent.futures.Future()
+                future.cancel()
+                return future
+
+        with mock.patch.object(routing_pool, 'get_pool', return_value=RestartedPool()):
+            restarted = asyncio.run(views.find_pharmacies_async_api(request))
+        self.assertEqual(restarted.status_code, 503)
+        self.assertIn('restarted', json.loads(restarted.content)['error'])
+
+    def test_shared_graph_outlives_the_replaced_pool(self):
+        G = RoadGraph.from_networkx(make_road_graph())
+        with mock.patch.object(routing_pool, 'POOL_WORKERS', 1):
+            routing_pool.get_pool(G, {})
+        name = routing_pool._shared_block.name
+        release = threading.Event()
+        real_shutdown = concurrent.futures.ProcessPoolExecutor.shutdown
+
+        def shutdown(pool, *args, **kwargs):
+            # Stand-in for workers that are still starting up.
+            release.wait(5)
+            real_shutdown(pool, *args, **kwargs)
+
+        with mock.patch.object(concurrent.futures.ProcessPoolExecutor, 'shutdown', shutdown):
+            with routing_pool._pool_lock:
+                retiring = routing_pool._close_pool(wait=False)
+            self.assertTrue(os.path.exists(f'/dev/shm/{name}'))
+            release.set()
+            retiring.join(5)
+        self.assertFalse(os.path.exists(f'/dev/shm/{name}'))
+
+    def test_bad_requests_and_backpressure(self):
+        bad = asyncio.run(views.find_pharmacies_async_api(RequestFactory().get('/api/', {'lat': 'x', 'lon': '1'})))
+        self.assertEqual(bad.status_code, 400)
+        request = RequestFactory().get('/api/', {'lat': '12.95', 'lon': '77.55'})
+        with mock.patch.object(routing_pool, 'MAX_PENDING', 0):
+            busy = asyncio.run(views.find_pharmacies_async_api(request))
+        self.assertEqual(busy.status_code, 503)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_build(self):
+        loader = warmup.SingleFlight('test')
+        cache = {}
+        builds = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def build():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            cache['value'] = 'graph'
+            return cache['value']
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(loader.load(lambda: cache.get('value'), build)))
+                   for _ in range(8)]
+        for t in threads:
+            t.start()
+        started.wait(5)
+        self.assertEqual(loader.status()['state'], 'loading')
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(results, ['graph'] * 8)
+        self.assertEqual(loader.status()['state'], 'ready')
+
+    def test_failed_build_is_reported_and_retried(self):
+        loader = warmup.SingleFlight('test')
+        with self.assertRaises(RuntimeError):
+            loader.load(lambda: None, mock.Mock(side_effect=RuntimeError('overpass down')))
+        self.assertEqual(loader.status()['state'], 'failed')
+        self.assertIn('overpass down', loader.status()['error'])
+        self.assertEqual(loader.load(lambda: None, lambda: 'graph'), 'graph')
+        self.assertEqual(loader.status()['state'], 'ready')
+
+    def test_readiness_view(self):
+        request = RequestFactory().get('/ready/')
+        with mock.patch.object(warmup.GRAPH, 'state', 'loading'), mock.patch.object(warmup.PHARMACIES, 'state', 'cold'):
+            with override_settings(ROUTING_WARMUP=False):
+                self.assertEqual(views.readiness_view(request).status_code, 200)
+            with override_settings(ROUTING_WARMUP=True):
+                response = views.readiness_view(request)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(json.loads(response.content)['caches']['graph']['state'], 'loading')
+
+
+# Counts warm-up starts while Django sets up (as every management command
+# and routing worker does) and then while the ASGI app is imported.
+WARMUP_PROBE = """
+import json
+import django
+from core import warmup
+calls = []
+warmup.start_background_warmup = lambda: calls.append('start')
+django.setup()
+setup_calls = len(calls)
+import healthnav.asgi
+print(json.dumps([setup_calls, len(calls)]))
+"""
+
+
+class WarmupStartTests(SimpleTestCase):
+    def test_only_the_asgi_app_starts_the_warmup(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='healthnav.settings', ROUTING_PRELOAD='0', ROUTING_WARMUP='1')
+        output = subprocess.run(
+            [sys.executable, '-c', WARMUP_PROBE], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), [0, 1])
+
+
+class GraphArtifactTests(SavedGraphTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ('CONTRACTION_HIERARCHY', 'NEAREST_PHARMACY_TABLE'):
+            patcher = mock.patch.object(pharmacy_routing, name, None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def save_artifacts(self, graph):
+        index = pharmacy_routing.PHARMACY_NODE_INDEX
+        pharmacy_routing.CONTRACTION_HIERARCHY_PATH = f'{self.tmp}/ch'
+        pharmacy_routing.NEAREST_PHARMACY_TABLE_PATH = f'{self.tmp}/table'
+        ContractionHierarchy.build(graph).save(pharmacy_routing.CONTRACTION_HIERARCHY_PATH)
+        NearestPharmacyTable.build(graph, index, 5).save(pharmacy_routing.NEAREST_PHARMACY_TABLE_PATH)
+
+    def find(self, mode):
+        request = RequestFactory().get('/api/', {'lat': '12.95', 'lon': '77.55', 'mode': mode})
+        response = views.find_pharmacies_dijkstra_api(request)
+        return response.status_code, json.loads(response.content)
+
+    def test_artifacts_from_another_graph_are_refused(self):
+        self.save_artifacts(RoadGraph.from_networkx(make_road_graph(seed=8)))
+        self.assertIsNone(pharmacy_routing.get_contraction_hierarchy())
+        self.assertIsNone(pharmacy_routing.get_nearest_pharmacy_table())
+        expected = self.find('single_source')
+        self.assertEqual(self.find('ch'), expected)
+        self.assertEqual(self.find('table'), expected)
+
+    def test_artifacts_from_the_loaded_graph_are_used(self):
+        self.save_artifacts(pharmacy_routing.GRAPH_CACHE)
+        self.assertIsNotNone(pharmacy_routing.get_contraction_hierarchy())
+        self.assertIsNotNone(pharmacy_routing.get_nearest_pharmacy_table())
+        self.assertEqual(self.find('ch'), self.find('single_source'))
+
+
+class IsochroneTests(SavedGraphTestCase):
+    def test_isochrone_matches_full_search_and_is_memoized(self):
+        G = pharmacy_routing.GRAPH_CACHE
+        index = pharmacy_routing.PHARMACY_NODE_INDEX
+        node = G.nearest_nodes(77.55, 12.95)
+        everything = dict(G.iter_targets_by_distance(node, range(len(G))))
+        pharmacy_routing.ISOCHRONE_CACHE.clear()
+
+        def get(radius):
+            request = RequestFactory().get('/api/isochrone/', {'lat': '12.95', 'lon': '77.55', 'radius': radius})
+            response = views.isochrone_api(request)
+            return response.status_code, json.loads(response.content)
+
+        status, data = get(600)
+        self.assertEqual(status, 200)
+        self.assertEqual(data['boundary_radius'], 750)
+        self.assertEqual(data['reachable_nodes'], sum(d <= 750 for d in everything.values()))
+        expected = sorted(round(everything[n], 1) for n in index if everything.get(n, 1e9) <= 600)
+        self.assertEqual([p['distance'] for p in data['pharmacies']], expected)
+        self.assertEqual(data['boundary']['type'], 'Polygon')
+
+        _, narrower = get(520)
+        self.assertEqual(len(pharmacy_routing.ISOCHRONE_CACHE), 1)
+        self.assertLessEqual(len(narrower['pharmacies']), len(data['pharmacies']))
+        self.assertEqual(get(0)[0], 400)
+        self.assertEqual(get('far')[0], 400)
+
+
+# Imports the ASGI app the way a worker does and reports how long it took and
+# which heavy modules it loaded.
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import healthnav.asgi, healthnav.urls, core.consumers
+print(json.dumps({'seconds': time.perf_counter() - start, 'modules': sorted(sys.modules)}))
+"""
+GEOSPATIAL_MODULES = {'osmnx', 'networkx', 'geopandas', 'shapely', 'pandas'}
+
+
+class ImportTimeTests(SimpleTestCase):
+    def probe(self, preload, graph_path):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='healthnav.settings', ROUTING_PRELOAD=preload,
+                   ROAD_GRAPH_PATH=graph_path)
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def test_queue_only_worker_skips_geospatial_stack(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            saved = f'{tmp}/road_graph'
+            RoadGraph.from_networkx(make_road_graph()).save(saved)
+            lazy = self.probe('0', saved)
+            self.assertFalse(GEOSPATIAL_MODULES & set(lazy['modules']))
+            eager = self.probe('1', saved)
+            self.assertTrue(GEOSPATIAL_MODULES <= set(eager['modules']))
+            self.assertLess(lazy['seconds'], eager['seconds'])
+            # A fresh checkout has no saved graph, so there is nothing to preload.
+            fresh = self.probe('1', f'{tmp}/missing')
+            self.assertFalse(GEOSPATIAL_MODULES & set(fresh['modules']))
+
+
+class CoalescingSchedulerTests(SimpleTestCase):
+    async def test_burst_is_sent_once_per_key(self):
+        sent = []
+
+        async def send(key):
+            sent.append(key)
+
+        scheduler = CoalescingScheduler(send, window=0.05)
+        for _ in range(20):
+            await scheduler.schedule('Cardiology')
+        await scheduler.schedule('Neurology')
+        await asyncio.sleep(0.2)
+        self.assertEqual(sorted(sent), ['Cardiology', 'Neurology'])
+        self.assertEqual((scheduler.requested, scheduler.sent), (21, 2))
+
+    async def test_change_during_send_is_delivered(self):
+        sent = []
+
+        async def send(key):
+            sent.append(key)
+            if len(sent) == 1:
+                await scheduler.schedule(key)
+
+        scheduler = CoalescingScheduler(send, window=0.01)
+        await scheduler.schedule('Cardiology')
+        await asyncio.sleep(0.2)
+        self.assertEqual(sent, ['Cardiology', 'Cardiology'])
+
+    async def test_flush_sends_pending_immediately(self):
+        sent = []
+
+        async def send(key):
+            sent.append(key)
+
+        scheduler = CoalescingScheduler(send, window=60)
+        await scheduler.schedule('Neurology')
+        self.assertEqual(scheduler.pending(), ['Neurology'])
+        await scheduler.flush()
+        self.assertEqual(sent, ['Neurology'])
+        self.assertEqual(scheduler.pending(), [])
+
+    def test_timer_on_a_closed_loop_is_replaced(self):
+        scheduler = CoalescingScheduler(mock.AsyncMock(), window=60)
+        asyncio.run(scheduler.schedule('Neurology'))
+        asyncio.run(scheduler.schedule('Neurology'))
+        self.assertEqual(scheduler.pending(), ['Neurology'])
+        self.assertEqual(scheduler.requested, 2)
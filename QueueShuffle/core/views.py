@@ -1,15 +1,17 @@
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from .queue_manager import (
     add_to_queue, get_queue_position, get_queue_count, 
     remove_from_queue, get_queue_number, assign_specialty,
-    is_in_any_queue, PATIENT_QUEUES
+    is_in_any_queue, get_specialties, get_queue_snapshot, aget_queue_snapshot
 )
-import osmnx as ox
-import networkx as nx
-import time
+from .queue_backends import QueueNumbersExhausted
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from .broadcasting import CoalescingScheduler
+from . import metrics, warmup
 
 def home_view(request):
     return render(request, 'core/home.html')
@@ -28,8 +30,11 @@ def patient_submit_view(request):
         session_key = request.session.session_key
 
         if not is_in_any_queue(session_key):
-            queue_number = add_to_queue(specialty, session_key)
-            broadcast_queue_update(specialty)
+            try:
+                queue_number = add_to_queue(specialty, session_key)
+            except QueueNumbersExhausted:
+                return HttpResponse('All queue numbers are currently in use. Please try again shortly.', status=503)
+            schedule_queue_update(specialty)
 
         return redirect('patient_status', specialty=specialty)
     return redirect('patient_form')
@@ -50,14 +55,12 @@ def patient_status_view(request, specialty):
     return render(request, 'core/patient_status.html', context)
 
 def doctor_specialty_select_view(request):
-    specialties = PATIENT_QUEUES.keys()
+    specialties = get_specialties()
     return render(request, 'core/doctor_specialty_select.html', {'specialties': specialties})
 
 def doctor_dashboard_view(request, specialty):
-    queue = PATIENT_QUEUES.get(specialty, [])
     queue_list = []
-    for idx, session_key in enumerate(queue):
-        queue_number = get_queue_number(session_key)
+    for idx, (session_key, queue_number) in enumerate(get_queue_snapshot(specialty)):
         queue_list.append({
             'position': idx + 1,
             'queue_number': queue_number,
@@ -75,109 +78,116 @@ def doctor_accept_patient_view(request, specialty):
     if request.method == 'POST':
         removed_session = remove_from_queue(specialty)
         if removed_session:
-            broadcast_queue_update(specialty)
+            schedule_queue_update(specialty)
     return redirect('doctor_dashboard', specialty=specialty)
 
-def broadcast_queue_update(specialty):
+QUEUE_BROADCAST_MODE = getattr(settings, 'QUEUE_BROADCAST_MODE', 'snapshot')
+
+def queue_group_name(specialty):
+    return f'queue_{specialty.replace(" ", "_")}'
+
+def snapshot_event(snapshot):
+    # The whole queue once, in order, as [session_key, queue_number] pairs;
+    # each consumer finds its own entry and takes its position from the index.
+    return {
+        'type': 'queue_update',
+        'total': len(snapshot),
+        'queue': [[session_key, queue_number] for session_key, queue_number in snapshot],
+    }
+
+def queue_snapshot_event(specialty):
+    return snapshot_event(get_queue_snapshot(specialty))
+
+async def abroadcast_queue_update(specialty):
     channel_layer = get_channel_layer()
-    room_group_name = f'queue_{specialty.replace(" ", "_")}'
-    
-    queue = PATIENT_QUEUES.get(specialty, [])
-    for idx, session_key in enumerate(queue):
-        async_to_sync(channel_layer.group_send)(
-            room_group_name,
-            {
-                'type': 'queue_update',
-                'position': idx + 1,
-                'total': len(queue),
-                'queue_number': get_queue_number(session_key),
-                'session_key': session_key
-            }
-        )
-
-GRAPH_CACHE = None
-
-def get_graph():
-    global GRAPH_CACHE
-    if GRAPH_CACHE is None:
-        print("--- Caching road network graph for Bengaluru. This will happen only once. ---")
-        start_time = time.time()
-        GRAPH_CACHE = ox.graph_from_place('Bengaluru, India', network_type='drive')
-        print(f"--- Graph cached in {time.time() - start_time:.2f} seconds. ---")
-    return GRAPH_CACHE
+    room_group_name = queue_group_name(specialty)
+
+    with metrics.timed('queue.broadcast', mode=QUEUE_BROADCAST_MODE):
+        snapshot = await aget_queue_snapshot(specialty)
+        if QUEUE_BROADCAST_MODE == 'snapshot':
+            await channel_layer.group_send(room_group_name, snapshot_event(snapshot))
+            metrics.increment('queue.broadcast_messages', mode=QUEUE_BROADCAST_MODE)
+            metrics.observe('queue.broadcast_fanout', len(snapshot), buckets=metrics.SIZE_BUCKETS)
+            return
+
+        for idx, (session_key, queue_number) in enumerate(snapshot):
+            await channel_layer.group_send(
+                room_group_name,
+                {
+                    'type': 'queue_update',
+                    'position': idx + 1,
+                    'total': len(snapshot),
+                    'queue_number': queue_number,
+                    'session_key': session_key
+                }
+            )
+        metrics.increment('queue.broadcast_messages', len(snapshot), mode=QUEUE_BROADCAST_MODE)
+        metrics.observe('queue.broadcast_fanout', len(snapshot), buckets=metrics.SIZE_BUCKETS)
+
+def broadcast_queue_update(specialty):
+    async_to_sync(abroadcast_queue_update)(specialty)
+
+QUEUE_BROADCAST_WINDOW = getattr(settings, 'QUEUE_BROADCAST_WINDOW_MS', 100) / 1000
+QUEUE_BROADCAST_SCHEDULER = CoalescingScheduler(abroadcast_queue_update, QUEUE_BROADCAST_WINDOW)
+
+def schedule_queue_update(specialty):
+    if QUEUE_BROADCAST_WINDOW <= 0:
+        broadcast_queue_update(specialty)
+    else:
+        # Views run in a worker thread under ASGI and async_to_sync hands the
+        # call back to the server's event loop, so the delayed broadcast runs
+        # there rather than on a fresh loop per timer.
+        async_to_sync(QUEUE_BROADCAST_SCHEDULER.schedule)(specialty)
+
+def metrics_view(request):
+    if not metrics.ENABLED:
+        return JsonResponse({'error': 'Metrics are disabled (METRICS_ENABLED)'}, status=404)
+    if request.GET.get('format') == 'prometheus':
+        return HttpResponse(metrics.prometheus_text(), content_type='text/plain; version=0.0.4')
+    return JsonResponse(metrics.snapshot())
+
+def readiness_view(request):
+    # Routing caches only gate readiness when this worker is warming them up;
+    # otherwise they load lazily and are just reported.
+    required = ('graph', 'pharmacies') if getattr(settings, 'ROUTING_WARMUP', False) else ()
+    ready, report = warmup.readiness(required)
+    return JsonResponse(report, status=200 if ready else 503)
 
 def dijkstra_locator_view(request):
     return render(request, 'core/dijkstra_locator.html')
 
-PHARMACY_CACHE = None
-
 def find_pharmacies_dijkstra_api(request):
-    global PHARMACY_CACHE
-    lat_str = request.GET.get('lat')
-    lon_str = request.GET.get('lon')
-
-    if not lat_str or not lon_str:
-        return JsonResponse({'error': 'Latitude and longitude are required'}, status=400)
-
+    # Imported on first use: routing pulls in osmnx, networkx and numpy,
+    # which queue-only workers never need.
+    from . import pharmacy_routing
+    return pharmacy_routing.find_pharmacies_dijkstra_api(request)
+
+def isochrone_api(request):
+    from . import pharmacy_routing
+    return pharmacy_routing.isochrone_api(request)
+
+@csrf_exempt
+def pharmacy_distances_api(request):
+    # JSON API for batch jobs, so no CSRF token; it only reads.
+    from . import pharmacy_routing
+    return pharmacy_routing.pharmacy_distances_api(request)
+
+async def find_pharmacies_async_api(request):
+    # Same results as find_pharmacies_dijkstra_api, but the search runs in the
+    # routing process pool so it never blocks this worker's event loop.
+    from . import pharmacy_routing, routing_pool
     try:
-        user_point = (float(lat_str), float(lon_str))
-        G = get_graph()
-        
-        if PHARMACY_CACHE is None:
-            print("--- Caching all pharmacies in Bengaluru. This happens once. ---")
-            start_time = time.time()
-            
-            nodes_data = list(G.nodes(data=True))
-            lats = [data['y'] for _, data in nodes_data]
-            lons = [data['x'] for _, data in nodes_data]
-            
-            north, south = max(lats), min(lats)
-            east, west = max(lons), min(lons)
-            
-            tags = {"amenity": "pharmacy"}
-            gdf = ox.features_from_bbox((north, south, east, west), tags)
-            gdf = gdf[gdf.geom_type == 'Point']
-            
-            PHARMACY_CACHE = gdf
-            print(f"--- Cached {len(gdf)} pharmacies in {time.time() - start_time:.2f} seconds. ---")
-        
-        gdf = PHARMACY_CACHE
-        
-        if gdf.empty:
-            return JsonResponse({'pharmacies': []})
-        
-        user_node = ox.nearest_nodes(G, user_point[1], user_point[0])
-        
-        results = []
-        for idx, row in gdf.iterrows():
-            try:
-                pharmacy_node = ox.nearest_nodes(G, row.geometry.x, row.geometry.y)
-                
-                distance = nx.dijkstra_path_length(
-                    G, 
-                    source=user_node, 
-                    target=pharmacy_node, 
-                    weight='length'
-                )
-                
-                name = row.get('name', 'Unnamed Pharmacy')
-                if not isinstance(name, str):
-                    name = 'Unnamed Pharmacy'
-                    
-                results.append({
-                    'name': name,
-                    'vicinity': f"{distance:.0f} meters away",
-                    'distance_numeric': distance
-                })
-            except (nx.NetworkXNoPath, KeyError, Exception):
-                continue
-        
-        sorted_results = sorted(results, key=lambda p: p['distance_numeric'])
-        final_results = [{'name': r['name'], 'vicinity': r['vicinity']} for r in sorted_results[:5]]
-        
-        return JsonResponse({'pharmacies': final_results})
-
+        user_point = pharmacy_routing.parse_user_point(request)
+        mode = request.GET.get('mode', pharmacy_routing.PHARMACY_ROUTING_MODE)
+        pharmacies = await routing_pool.nearest_pharmacies(user_point, mode)
+        return JsonResponse({'pharmacies': pharmacies})
+
+    except pharmacy_routing.RoutingRequestError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+    except routing_pool.RoutingBusy as e:
+        return JsonResponse({'error': str(e)}, status=503)
     except Exception as e:
         import traceback
         traceback.print_exc()
         return JsonResponse({'error': f"An internal error occurred: {str(e)}"}, status=500)
+
@@ -0,0 +1,84 @@
+import threading
+import time
+
+from . import metrics
+
+# --- Single-flight cache loading ---
+# Building the road graph or the pharmacy index from Overpass takes minutes.
+# Every lazy loader goes through a SingleFlight, so when several requests hit
+# a cold worker one of them builds and the rest wait for its result instead
+# of starting builds of their own. This module stays free of the geospatial
+# stack so /ready/ can report state from queue-only workers too.
+
+
+class SingleFlight:
+    """Runs at most one build at a time; callers arriving mid-build wait for it."""
+
+    def __init__(self, name):
+        self.name = name
+        # Re-entrant so a build may call other loaders that share this one.
+        self._lock = threading.RLock()
+        self.state = 'cold'
+        self.error = None
+        self.seconds = None
+        self.waiting = 0
+
+    def load(self, current, build):
+        """current() returns the cached value or None; build() makes and stores it."""
+        value = current()
+        if value is not None:
+            return value
+
+        self.waiting += 1
+        try:
+            with self._lock:
+                value = current()
+                if value is not None:
+                    metrics.increment('cache.single_flight_wait', cache=self.name)
+                    return value
+                self.state = 'loading'
+                start = time.perf_counter()
+                try:
+                    value = build()
+                except Exception as e:
+                    self.state = 'failed'
+                    self.error = f'{type(e).__name__}: {e}'
+                    raise
+                self.seconds = time.perf_counter() - start
+                self.state = 'cold' if value is None else 'ready'
+                self.error = None
+                return value
+        finally:
+            self.waiting -= 1
+
+    def status(self):
+        return {'state': self.state, 'seconds': self.seconds, 'error': self.error, 'waiting': self.waiting}
+
+
+GRAPH = SingleFlight('graph')
+PHARMACIES = SingleFlight('pharmacies')
+LOADERS = (GRAPH, PHARMACIES)
+
+
+def start_background_warmup():
+    """Build the graph and pharmacy index in a daemon thread."""
+    def run():
+        from . import pharmacy_routing
+        start = time.time()
+        try:
+            pharmacy_routing.get_pharmacy_index(pharmacy_routing.get_graph())
+        except Exception as e:
+            print(f"--- Routing warm-up failed: {e} ---")
+        else:
+            print(f"--- Routing warm-up finished in {time.time() - start:.2f} seconds. ---")
+
+    thread = threading.Thread(target=run, name='routing-warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness(required):
+    """(ready, report) where ready means every required loader has finished."""
+    caches = {loader.name: loader.status() for loader in LOADERS}
+    ready = all(caches[name]['state'] == 'ready' for name in required)
+    return ready, {'ready': ready, 'required': list(required), 'caches': caches}
@@ -8,8 +8,16 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'healthnav.settings')
 
 django_asgi_app = get_asgi_application()
 
+from django.conf import settings
 from core import routing
 
+# Warm up here rather than in CoreConfig.ready, so only the serving process
+# downloads the graph; management commands and routing pool workers also
+# run django.setup() and must not.
+if settings.ROUTING_WARMUP:
+    from core import warmup
+    warmup.start_background_warmup()
+
 application = ProtocolTypeRouter({
     'http': django_asgi_app,
     'websocket': AllowedHostsOriginValidator(
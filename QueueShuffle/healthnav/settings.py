@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -87,6 +88,109 @@ CHANNEL_LAYERS = {
 }
 
 
+# Queue broadcasts: 'snapshot' sends one session -> position map per change and
+# lets each socket pick its own entry; 'per_patient' is the old one message per
+# queued patient.
+
+QUEUE_BROADCAST_MODE = 'snapshot'
+
+# Changes to a specialty's queue within this window are merged into a single
+# broadcast of the final state. 0 broadcasts every change immediately.
+
+QUEUE_BROADCAST_WINDOW_MS = 100
+
+# Where patient queues live. 'memory' is per-process and only safe with one
+# worker; 'redis' keeps them in Redis so every worker sees the same queues.
+
+QUEUE_BACKEND = 'memory'
+QUEUE_REDIS_URL = 'redis://127.0.0.1:6379/1'
+
+# QUEUE_BACKEND = 'journal' keeps the in-memory queues (single worker) but
+# logs every join/accept here and replays it on restart. Changes are fsynced
+# in batches by a background thread; a snapshot every N changes keeps the
+# replay short.
+
+QUEUE_JOURNAL_PATH = BASE_DIR / 'queue_journal'
+QUEUE_JOURNAL_SNAPSHOT_EVERY = 10000
+QUEUE_JOURNAL_FSYNC = True
+
+# In-process counters and latency histograms, one set per worker, served at
+# /metrics/ (JSON, or ?format=prometheus). Off by default.
+
+METRICS_ENABLED = False
+
+
+# Pharmacy locator
+# 'single_source' runs one bounded Dijkstra from the user; 'pairwise' is the
+# original one-search-per-pharmacy loop, kept for comparison (?mode=pairwise).
+
+PHARMACY_ROUTING_MODE = 'single_source'
+
+# Per-worker LRU of pharmacy results keyed by the user's snapped road node.
+# Set the size to 0 to disable.
+
+PHARMACY_RESULT_CACHE_SIZE = 4096
+PHARMACY_RESULT_CACHE_TTL = 600  # seconds
+
+# osmnx HTTP responses live in one SQLite file instead of thousands of JSON
+# files under cache/. Import old files with `manage.py import_overpass_cache`
+# and trim with `manage.py compact_overpass_cache`.
+
+OVERPASS_CACHE_PATH = BASE_DIR / 'osm_cache.sqlite3'
+OVERPASS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Compact road graph written by `manage.py build_road_graph`. When present,
+# workers memory-map it at startup instead of calling ox.graph_from_place.
+
+ROAD_GRAPH_PATH = Path(os.environ.get('ROAD_GRAPH_PATH', BASE_DIR / 'road_graph'))
+
+# Contraction hierarchy built from ROAD_GRAPH_PATH by
+# `manage.py build_contraction_hierarchy`; enables ?mode=ch.
+
+CONTRACTION_HIERARCHY_PATH = BASE_DIR / 'road_graph_ch'
+
+# k nearest pharmacies for every road node, written by
+# `manage.py build_pharmacy_table`; enables ?mode=table.
+
+NEAREST_PHARMACY_TABLE_PATH = BASE_DIR / 'pharmacy_table'
+
+# Load the routing stack (osmnx, networkx, numpy) and the saved graphs when a
+# worker starts, if a saved graph exists at ROAD_GRAPH_PATH; on a fresh
+# checkout nothing is preloaded. Queue-only workers can set ROUTING_PRELOAD=0
+# in the environment; they then load routing on the first pharmacy request,
+# if ever.
+
+ROUTING_PRELOAD = os.environ.get('ROUTING_PRELOAD', '1') != '0'
+
+# Build the full graph and pharmacy index in a background thread when the ASGI
+# app starts, so the first locator request doesn't pay for the Overpass
+# download. While it runs, /ready/ answers 503; without it /ready/ only
+# reports cache state. Management commands never warm up.
+
+ROUTING_WARMUP = os.environ.get('ROUTING_WARMUP', '0') == '1'
+
+# /api/find_pharmacies_dijkstra/async/ runs searches in a pool of worker
+# processes (default: one per CPU) that share the saved road graph via mmap.
+# Requests beyond ROUTING_MAX_PENDING, or slower than the timeout, get a 503.
+
+ROUTING_POOL_WORKERS = None
+ROUTING_MAX_PENDING = 32
+ROUTING_TIMEOUT_SECONDS = 10
+
+# POST /api/pharmacy_distances/ streams clinic -> pharmacy distances as NDJSON,
+# computed in the same pool. Larger jobs should be split.
+
+DISTANCE_MATRIX_MAX_ORIGINS = 10000
+
+# /api/isochrone/ rounds radii up to this many metres so nearby requests share
+# one search, and keeps the last ISOCHRONE_CACHE_SIZE results per worker.
+
+ISOCHRONE_BUCKET_M = 250
+ISOCHRONE_MAX_RADIUS_M = 5000
+ISOCHRONE_CACHE_SIZE = 1024
+ISOCHRONE_CACHE_TTL = 600  # seconds
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -13,4 +13,9 @@ urlpatterns = [
     path('doctor/accept/<str:specialty>/', views.doctor_accept_patient_view, name='doctor_accept_patient'),
     path('dijkstra-locator/', views.dijkstra_locator_view, name='dijkstra_locator'),
     path('api/find_pharmacies_dijkstra/', views.find_pharmacies_dijkstra_api, name='find_pharmacies_dijkstra_api'),
+    path('api/find_pharmacies_dijkstra/async/', views.find_pharmacies_async_api, name='find_pharmacies_async_api'),
+    path('api/isochrone/', views.isochrone_api, name='isochrone_api'),
+    path('api/pharmacy_distances/', views.pharmacy_distances_api, name='pharmacy_distances_api'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('ready/', views.readiness_view, name='readiness'),
 ]
@@ -0,0 +1,140 @@
+import heapq
+import math
+from itertools import count
+
+import networkx as nx
+
+# --- A* search with metric heuristics and ALT landmarks ---
+# Edge weights are OSM lengths in metres, so a heuristic has to be in metres
+# too. Great-circle distance never exceeds the road distance between two
+# nodes, which makes it admissible. ALT (A*, Landmarks, Triangle inequality)
+# adds tighter lower bounds from precomputed distances to a few landmarks.
+
+EARTH_RADIUS_M = 6_371_009
+DEFAULT_LANDMARK_COUNT = 8
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def euclidean_heuristic(G, target):
+    # The original heuristic: straight-line distance in raw degrees. Admissible
+    # only because it is tiny compared to metres, so it prunes almost nothing.
+    t = (G.nodes[target]['y'], G.nodes[target]['x'])
+    return lambda u: math.dist((G.nodes[u]['y'], G.nodes[u]['x']), t)
+
+
+def haversine_heuristic(G, target):
+    t_lat, t_lon = G.nodes[target]['y'], G.nodes[target]['x']
+    return lambda u: haversine_m(G.nodes[u]['y'], G.nodes[u]['x'], t_lat, t_lon)
+
+
+class Landmarks:
+    """Road distances from and to a handful of well-spread landmark nodes."""
+
+    def __init__(self, nodes, from_landmark, to_landmark):
+        self.nodes = nodes
+        self.from_landmark = from_landmark
+        self.to_landmark = to_landmark
+
+    @classmethod
+    def build(cls, G, count=DEFAULT_LANDMARK_COUNT, weight='length'):
+        if not len(G):
+            return cls([], [], [])
+        reverse = G.reverse(copy=False)
+
+        # Farthest-point selection: each new landmark is the node farthest
+        # from the ones already picked, which spreads them to the periphery.
+        undirected = G.to_undirected(as_view=True)
+        landmarks = []
+        seed = next(iter(G.nodes))
+        for _ in range(min(count, len(G))):
+            sources = landmarks or [seed]
+            dist = nx.multi_source_dijkstra_path_length(undirected, sources, weight=weight)
+            candidate = max(dist, key=dist.get)
+            if candidate in landmarks:
+                break
+            landmarks.append(candidate)
+
+        from_landmark = [nx.single_source_dijkstra_path_length(G, lm, weight=weight) for lm in landmarks]
+        to_landmark = [nx.single_source_dijkstra_path_length(reverse, lm, weight=weight) for lm in landmarks]
+        return cls(landmarks, from_landmark, to_landmark)
+
+    def lower_bound(self, u, target):
+        best = 0.0
+        for d_from, d_to in zip(self.from_landmark, self.to_landmark):
+            # d(u, t) >= d(L, t) - d(L, u)  and  d(u, t) >= d(u, L) - d(t, L)
+            lu, lt = d_from.get(u), d_from.get(target)
+            if lu is not None and lt is not None and lt - lu > best:
+                best = lt - lu
+            ul, tl = d_to.get(u), d_to.get(target)
+            if ul is not None and tl is not None and ul - tl > best:
+                best = ul - tl
+        return best
+
+
+def get_landmarks(G, count=DEFAULT_LANDMARK_COUNT):
+    # Stored on the graph itself so landmarks live exactly as long as the
+    # cached graph they were computed for.
+    landmarks = G.graph.get('alt_landmarks')
+    if landmarks is None:
+        landmarks = Landmarks.build(G, count)
+        G.graph['alt_landmarks'] = landmarks
+    return landmarks
+
+
+def alt_heuristic(G, target):
+    landmarks = get_landmarks(G)
+    haversine = haversine_heuristic(G, target)
+    return lambda u: max(landmarks.lower_bound(u, target), haversine(u))
+
+
+HEURISTICS = {
+    'euclidean': euclidean_heuristic,
+    'haversine': haversine_heuristic,
+    'alt': alt_heuristic,
+}
+
+
+def astar_length(G, source, target, heuristic, weight='length'):
+    """A* distance from source to target plus the number of expanded nodes.
+
+    `heuristic` is a factory taking (G, target) and returning h(u).
+    Raises nx.NetworkXNoPath when the target is unreachable.
+    """
+    h = heuristic(G, target)
+    succ = G._succ
+    multigraph = G.is_multigraph()
+    tie = count()
+
+    g_score = {source: 0.0}
+    h_cache = {}
+    closed = set()
+    heap = [(h(source), next(tie), 0.0, source)]
+    expanded = 0
+
+    while heap:
+        _, _, g, u = heapq.heappop(heap)
+        if u in closed:
+            continue
+        if u == target:
+            return g, expanded
+        closed.add(u)
+        expanded += 1
+        for v, data in succ[u].items():
+            if v in closed:
+                continue
+            w = min(d.get(weight, 1) for d in data.values()) if multigraph else data.get(weight, 1)
+            ng = g + w
+            if ng < g_score.get(v, math.inf):
+                g_score[v] = ng
+                if v not in h_cache:
+                    h_cache[v] = h(v)
+                heapq.heappush(heap, (ng + h_cache[v], next(tie), ng, v))
+
+    raise nx.NetworkXNoPath(f"Node {target} not reachable from {source}")
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.overpass_cache import OverpassCacheStore
+
+
+class Command(BaseCommand):
+    help = 'Evict old or over-budget Overpass responses and rewrite the cache file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-days', type=float, default=None)
+
+    def handle(self, *args, **options):
+        store = OverpassCacheStore(settings.OVERPASS_CACHE_PATH, getattr(settings, 'OVERPASS_CACHE_MAX_BYTES', None))
+        before = store.stats()
+        max_age = options['max_age_days'] * 86400 if options['max_age_days'] else None
+        removed = store.compact(max_age=max_age)
+        after = store.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} entries; {before['bytes']} -> {after['bytes']} bytes, {after['entries']} entries left"
+        ))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.overpass_cache import OverpassCacheStore
+
+
+class Command(BaseCommand):
+    help = 'Import osmnx <sha1>.json cache files into the single-file Overpass cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directories', nargs='*', default=[str(settings.BASE_DIR / 'cache')])
+        parser.add_argument('--overwrite', action='store_true')
+
+    def handle(self, *args, **options):
+        store = OverpassCacheStore(settings.OVERPASS_CACHE_PATH, getattr(settings, 'OVERPASS_CACHE_MAX_BYTES', None))
+        for directory in options['directories']:
+            imported, skipped = store.import_directory(directory, overwrite=options['overwrite'])
+            self.stdout.write(f"{directory}: imported {imported}, skipped {skipped}")
+        stats = store.stats()
+        self.stdout.write(self.style.SUCCESS(f"{stats['entries']} entries, {stats['bytes']} bytes in {stats['path']}"))
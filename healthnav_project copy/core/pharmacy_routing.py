@@ -0,0 +1,85 @@
+from django.http import JsonResponse
+import osmnx as ox
+import networkx as nx
+from django.conf import settings
+from .tile_cache import TiledGraphSource
+from .astar import HEURISTICS, astar_length
+from .overpass_cache import OverpassCacheStore, install
+
+if getattr(settings, 'OVERPASS_CACHE_PATH', None):
+    install(OverpassCacheStore(settings.OVERPASS_CACHE_PATH, getattr(settings, 'OVERPASS_CACHE_MAX_BYTES', None)))
+
+# --- Tile cache shared by all requests in this worker ---
+# Road graphs and pharmacies are built per fixed-size tile and merged for the
+# tiles around each user, so nearby requests reuse what is already built.
+TILE_SOURCE = TiledGraphSource(
+    tile_size=getattr(settings, 'TILE_SIZE_DEGREES', 0.05),
+    graph_budget=getattr(settings, 'TILE_GRAPH_BUDGET', 2_000_000),
+    pharmacy_budget=getattr(settings, 'TILE_PHARMACY_BUDGET', 200_000),
+    pharmacy_tile_size=getattr(settings, 'TILE_PHARMACY_SIZE_DEGREES', 0.25),
+)
+GRAPH_RADIUS = 10000
+PHARMACY_RADIUS = 25000
+ASTAR_HEURISTIC = getattr(settings, 'ASTAR_HEURISTIC', 'haversine')
+
+# --- API view for finding pharmacies (UPDATED FOR OPENSTREETMAP) ---
+def find_pharmacies_api(request):
+    lat_str = request.GET.get('lat')
+    lon_str = request.GET.get('lon')
+
+    if not lat_str or not lon_str:
+        return JsonResponse({'error': 'Latitude and longitude are required'}, status=400)
+
+    try:
+        user_point = (float(lat_str), float(lon_str))
+        G = TILE_SOURCE.graph_around(user_point, GRAPH_RADIUS)
+ 
+        # --- 2. PICK THE HEURISTIC FOR A* ---
+        # 'haversine' is the straight-line distance in metres (same unit as the
+        # edge lengths); 'alt' adds landmark bounds; 'euclidean' is the old
+        # degree-based heuristic, kept for comparison.
+        heuristic_name = request.GET.get('heuristic', ASTAR_HEURISTIC)
+        if heuristic_name not in HEURISTICS:
+            return JsonResponse({'error': f"Unknown heuristic '{heuristic_name}'"}, status=400)
+        heuristic = HEURISTICS[heuristic_name]
+
+        pharmacies_gdf = TILE_SOURCE.pharmacies_around(user_point, PHARMACY_RADIUS)
+        if pharmacies_gdf is None or pharmacies_gdf.empty:
+            return JsonResponse({'pharmacies': []}) 
+        
+        user_node = ox.nearest_nodes(G, user_point[1], user_point[0])
+        pharmacy_nodes = ox.nearest_nodes(G, pharmacies_gdf['geometry'].x, pharmacies_gdf['geometry'].y)
+
+        results = []
+        expanded_nodes = []
+        for i, node in enumerate(pharmacy_nodes):
+            try:
+                # --- 3. USE A* ALGORITHM INSTEAD OF DIJKSTRA ---
+                distance, expanded = astar_length(G, user_node, node, heuristic, weight='length')
+                expanded_nodes.append(expanded)
+
+                pharmacy_name = pharmacies_gdf.iloc[i]['name']
+                if pharmacy_name and not isinstance(pharmacy_name, float):
+                    results.append({
+                        'name': pharmacy_name,
+                        'vicinity': f"{distance:.0f} meters away"
+                    })
+            except (nx.NetworkXNoPath, KeyError):
+                continue
+        
+        sorted_results = sorted(results, key=lambda p: float(p['vicinity'].split()[0]))
+        search_stats = {
+            'heuristic': heuristic_name,
+            'searches': len(expanded_nodes),
+            'expanded_nodes': sum(expanded_nodes),
+            'max_expanded_nodes': max(expanded_nodes, default=0),
+        }
+        return JsonResponse({'pharmacies': sorted_results[:5], 'search_stats': search_stats})
+
+    except Exception as e:
+    # This will print the real, detailed error to your terminal
+        print("--- DETAILED ERROR IN API ---")
+        import traceback
+        traceback.print_exc() # This prints the full traceback
+        print("-----------------------------")
+        return JsonResponse({'error': f"An error occurred: {str(e)}"}, status=500)
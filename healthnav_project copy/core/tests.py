@@ -1,3 +1,137 @@
-from django.test import TestCase
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import networkx as nx
+from django.conf import settings
+from django.test import RequestFactory, TestCase
+
+from .astar import HEURISTICS, astar_length, haversine_m
+from .overpass_cache import OverpassCacheStore, cache_key
+from .tile_cache import TileCache, TiledGraphSource, graph_cost, tile_bbox, tile_key, tiles_around
+
+
+class TileCacheTests(TestCase):
+    def test_tiles_around_cover_the_radius(self):
+        keys = tiles_around(12.9716, 77.5946, 10000, 0.05)
+        self.assertIn(tile_key(12.9716, 77.5946, 0.05), keys)
+        west, south, _, _ = tile_bbox(min(keys), 0.05)
+        self.assertLessEqual(south, 12.9716 - 10000 / 111_320)
+        self.assertLessEqual(west, 77.5946 - 10000 / 111_320)
+
+    def test_evicts_least_recently_used_tiles_over_budget(self):
+        loads = []
+        cache = TileCache(lambda bbox: loads.append(bbox) or bbox, lambda value: 10, 0.05, budget=20)
+        cache.get((0, 0))
+        cache.get((0, 1))
+        cache.get((0, 0))
+        cache.get((0, 2))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        cache.get((0, 0))
+        self.assertEqual(len(loads), 3)
+        cache.get((0, 1))
+        self.assertEqual(len(loads), 4)
+
+    def test_merged_graphs_count_against_the_graph_budget(self):
+        def load_graph(bbox):
+            G = nx.MultiDiGraph()
+            G.add_node(bbox, x=bbox[0], y=bbox[1])
+            return G
+
+        source = TiledGraphSource(0.05, graph_budget=1000, pharmacy_budget=100, merged_cache_size=1)
+        source.graph_tiles.loader = load_graph
+        first = source.graph_around((12.9716, 77.5946), 10000)
+        self.assertEqual(source.graph_tiles.stats()['charged'], graph_cost(first))
+        second = source.graph_around((13.5, 78.0), 10000)
+        self.assertEqual(source.graph_tiles.stats()['charged'], graph_cost(second))
+        source.graph_tiles.charge(1000)
+        self.assertEqual(source.graph_tiles.stats()['tiles'], 1)
+
+    def test_pharmacies_use_coarser_tiles(self):
+        bboxes = []
+        source = TiledGraphSource(0.05, graph_budget=1000, pharmacy_budget=100, pharmacy_tile_size=0.25)
+        source.pharmacy_tiles.loader = lambda bbox: bboxes.append(bbox)
+        self.assertIsNone(source.pharmacies_around((12.9716, 77.5946), 25000))
+        self.assertEqual(len(bboxes), 9)
+
+
+def make_grid_graph(n=25, spacing=0.001, seed=3):
+    rng = random.Random(seed)
+    G = nx.MultiDiGraph()
+    for i in range(n):
+        for j in range(n):
+            G.add_node(i * n + j, y=12.9 + i * spacing, x=77.5 + j * spacing)
+    for i in range(n):
+        for j in range(n):
+            for di, dj in ((0, 1), (1, 0)):
+                if i + di < n and j + dj < n:
+                    u, v = i * n + j, (i + di) * n + j + dj
+                    straight = haversine_m(G.nodes[u]['y'], G.nodes[u]['x'], G.nodes[v]['y'], G.nodes[v]['x'])
+                    length = straight * rng.uniform(1.0, 1.6)
+                    G.add_edge(u, v, length=length)
+                    G.add_edge(v, u, length=length)
+    return G
+
+
+class AStarTests(TestCase):
+    def test_all_heuristics_return_dijkstra_distances(self):
+        G = make_grid_graph()
+        rng = random.Random(1)
+        for _ in range(10):
+            source, target = rng.sample(list(G.nodes), 2)
+            expected = nx.dijkstra_path_length(G, source, target, weight='length')
+            for heuristic in HEURISTICS.values():
+                distance, _ = astar_length(G, source, target, heuristic)
+                self.assertAlmostEqual(distance, expected)
+
+    def test_metric_heuristics_expand_fewer_nodes(self):
+        G = make_grid_graph()
+        _, euclidean = astar_length(G, 0, 624, HEURISTICS['euclidean'])
+        _, haversine = astar_length(G, 0, 624, HEURISTICS['haversine'])
+        _, alt = astar_length(G, 0, 624, HEURISTICS['alt'])
+        self.assertLess(haversine, euclidean)
+        self.assertLessEqual(alt, haversine)
+
+
+class LazyRoutingImportTests(TestCase):
+    def test_urls_do_not_load_the_geospatial_stack(self):
+        # Routing is imported on the first pharmacy request, not with the views.
+        probe = (
+            "import django, json, sys; django.setup(); import core.urls; "
+            "print(json.dumps(sorted(m for m in ('osmnx', 'networkx', 'scipy', 'geopandas') if m in sys.modules)))"
+        )
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE='healthnav_project.settings')
+        output = subprocess.run(
+            [sys.executable, '-c', probe], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), [])
+
+
+class OverpassCacheStoreTests(TestCase):
+    def test_imports_osmnx_json_files_and_reads_them_by_url_key(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy = Path(tmp) / 'cache'
+            legacy.mkdir()
+            key = cache_key('https://example.org/q')
+            (legacy / f'{key}.json').write_text(json.dumps({'elements': []}))
+            (legacy / 'broken.json').write_text('{')
+            store = OverpassCacheStore(Path(tmp) / 'osm_cache.sqlite3')
+            self.assertEqual(store.import_directory(legacy), (1, 1))
+            self.assertEqual(store.get(key), {'elements': []})
+
+
+class FindPharmaciesTests(TestCase):
+    def test_searches_around_the_requested_point(self):
+        from . import pharmacy_routing
+
+        request = RequestFactory().get('/api/', {'lat': '13.05', 'lon': '77.62'})
+        with mock.patch.object(pharmacy_routing.TILE_SOURCE, 'graph_around', side_effect=ValueError('no roads')) as graph_around:
+            response = pharmacy_routing.find_pharmacies_api(request)
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(graph_around.call_args[0][0], (13.05, 77.62))
@@ -0,0 +1,209 @@
+import math
+import threading
+from collections import OrderedDict
+
+import networkx as nx
+import osmnx as ox
+import pandas as pd
+from osmnx._errors import InsufficientResponseError
+
+# --- Geographic tile cache for road graphs and pharmacies ---
+# The world is cut into fixed-size lat/lon tiles. Each tile's drive network and
+# pharmacy points are downloaded once, kept in a memory-bounded LRU, and merged
+# on demand for the tiles around a user. Nearby requests reuse the same tiles
+# instead of rebuilding a 10 km graph from scratch.
+
+METRES_PER_DEGREE = 111_320
+PHARMACY_TAGS = {"amenity": "pharmacy"}
+
+
+def tile_key(lat, lon, tile_size):
+    return (math.floor(lat / tile_size), math.floor(lon / tile_size))
+
+
+def tile_bbox(key, tile_size):
+    # osmnx 2.x bbox order: (left, bottom, right, top)
+    row, col = key
+    return (col * tile_size, row * tile_size, (col + 1) * tile_size, (row + 1) * tile_size)
+
+
+def point_bbox(lat, lon, dist):
+    dlat = dist / METRES_PER_DEGREE
+    dlon = dist / (METRES_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return (lon - dlon, lat - dlat, lon + dlon, lat + dlat)
+
+
+def tiles_around(lat, lon, dist, tile_size):
+    west, south, east, north = point_bbox(lat, lon, dist)
+    min_row, min_col = tile_key(south, west, tile_size)
+    max_row, max_col = tile_key(north, east, tile_size)
+    return tuple(
+        (row, col)
+        for row in range(min_row, max_row + 1)
+        for col in range(min_col, max_col + 1)
+    )
+
+
+def graph_cost(G):
+    return G.number_of_nodes() + G.number_of_edges()
+
+
+def pharmacies_cost(gdf):
+    return 1 if gdf is None else len(gdf) + 1
+
+
+class TileCache:
+    """LRU of per-tile objects, bounded by a cost budget rather than a count.
+
+    `loader(bbox)` builds the object for one tile and `cost(obj)` estimates
+    its size (nodes + edges for graphs, rows for pharmacy frames). Objects
+    built from the tiles and kept elsewhere can be counted against the same
+    budget with charge().
+    """
+
+    def __init__(self, loader, cost, tile_size, budget):
+        self.loader = loader
+        self.cost = cost
+        self.tile_size = tile_size
+        self.budget = budget
+        self._tiles = OrderedDict()
+        self._used = 0
+        self._charged = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return self._tiles[key][0]
+            self.misses += 1
+
+        value = self.loader(tile_bbox(key, self.tile_size))
+        cost = self.cost(value)
+
+        with self._lock:
+            if key not in self._tiles:
+                self._tiles[key] = (value, cost)
+                self._used += cost
+            self._evict()
+        return value
+
+    def charge(self, cost):
+        """Count `cost` (negative to give it back) against the budget."""
+        with self._lock:
+            self._charged += cost
+            self._evict()
+
+    def _evict(self):
+        while self._used + self._charged > self.budget and len(self._tiles) > 1:
+            _, (_, evicted_cost) = self._tiles.popitem(last=False)
+            self._used -= evicted_cost
+            self.evictions += 1
+
+    def get_many(self, keys):
+        return [self.get(key) for key in keys]
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self._used = 0
+            self._charged = 0
+
+    def stats(self):
+        return {
+            'tiles': len(self._tiles),
+            'used': self._used,
+            'charged': self._charged,
+            'budget': self.budget,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+def load_graph_tile(bbox):
+    try:
+        # Keep edges that cross the tile border so neighbouring tiles join up.
+        return ox.graph_from_bbox(bbox, network_type='drive', truncate_by_edge=True, retain_all=True)
+    except (ValueError, InsufficientResponseError):
+        return nx.MultiDiGraph(crs='epsg:4326')
+
+
+def load_pharmacy_tile(bbox):
+    try:
+        gdf = ox.features_from_bbox(bbox, PHARMACY_TAGS)
+    except InsufficientResponseError:
+        return None
+    return gdf[gdf.geom_type == 'Point']
+
+
+class TiledGraphSource:
+    """Road graphs and pharmacies around a point, assembled from cached tiles.
+
+    Pharmacies use their own, coarser tiles: a pharmacy tile is one small
+    Overpass query whatever its area, so 0.05 degree tiles would cost about
+    100 requests to cover a 25 km radius. Merged graphs are copies of their
+    tiles and are charged to the graph budget while they are kept.
+    """
+
+    def __init__(self, tile_size, graph_budget, pharmacy_budget, merged_cache_size=4, pharmacy_tile_size=None):
+        pharmacy_tile_size = pharmacy_tile_size or tile_size
+        self.graph_tiles = TileCache(load_graph_tile, graph_cost, tile_size, graph_budget)
+        self.pharmacy_tiles = TileCache(load_pharmacy_tile, pharmacies_cost, pharmacy_tile_size, pharmacy_budget)
+        self.tile_size = tile_size
+        self.pharmacy_tile_size = pharmacy_tile_size
+        self.merged_cache_size = merged_cache_size
+        self._merged = OrderedDict()
+        self._lock = threading.Lock()
+
+    def graph_around(self, point, dist):
+        keys = tiles_around(point[0], point[1], dist, self.tile_size)
+        with self._lock:
+            if keys in self._merged:
+                self._merged.move_to_end(keys)
+                return self._merged[keys][0]
+
+        graphs = [G for G in self.graph_tiles.get_many(keys) if len(G)]
+        if not graphs:
+            raise ValueError(f"No drive network within {dist} m of {point}")
+        if len(graphs) == 1:
+            # The tile itself, already counted by graph_tiles.
+            G, cost = graphs[0], 0
+        else:
+            G = nx.compose_all(graphs)
+            cost = graph_cost(G)
+
+        released = 0
+        with self._lock:
+            if keys in self._merged:
+                # Another request merged the same tiles meanwhile; keep theirs.
+                return self._merged[keys][0]
+            self._merged[keys] = (G, cost)
+            while len(self._merged) > self.merged_cache_size:
+                _, (_, evicted_cost) = self._merged.popitem(last=False)
+                released += evicted_cost
+        self.graph_tiles.charge(cost - released)
+        return G
+
+    def pharmacies_around(self, point, dist):
+        keys = tiles_around(point[0], point[1], dist, self.pharmacy_tile_size)
+        frames = [gdf for gdf in self.pharmacy_tiles.get_many(keys) if gdf is not None and not gdf.empty]
+        if not frames:
+            return None
+        gdf = pd.concat(frames)
+        gdf = gdf[~gdf.index.duplicated(keep='first')]
+
+        west, south, east, north = point_bbox(point[0], point[1], dist)
+        x, y = gdf.geometry.x, gdf.geometry.y
+        return gdf[(x >= west) & (x <= east) & (y >= south) & (y <= north)]
+
+    def stats(self):
+        return {
+            'graph_tiles': self.graph_tiles.stats(),
+            'pharmacy_tiles': self.pharmacy_tiles.stats(),
+            'merged_graphs': len(self._merged),
+        }
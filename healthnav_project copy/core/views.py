@@ -1,11 +1,6 @@
 from django.shortcuts import render
 from django.http import JsonResponse
 import json
-import requests
-import osmnx as ox
-import networkx as nx
-import math
-import scipy
 # --- NOTE: We no longer need a Google Maps API key ---
 
 # --- Module 1: Decision Tree Logic (This remains the same) ---
@@ -57,66 +52,9 @@ def symptom_check_api(request):
         return JsonResponse(response_data)
 
 
-# --- API view for finding pharmacies (UPDATED FOR OPENSTREETMAP) ---
+# --- API view for finding pharmacies ---
+# The routing code lives in pharmacy_routing and pulls in osmnx, networkx and
+# geopandas, so it is imported on the first request rather than at startup.
 def find_pharmacies_api(request):
-    lat_str = request.GET.get('lat')
-    lon_str = request.GET.get('lon')
-
-    if not lat_str or not lon_str:
-        return JsonResponse({'error': 'Latitude and longitude are required'}, status=400)
-
-    try:
-        user_point = (float(lat_str), float(lon_str))
-        user_point = (12.9716, 77.5946) # Test location: Bengaluru City Center
-        G = ox.graph_from_point(user_point, dist=10000, network_type='drive')
- 
-        # --- 2. DEFINE THE HEURISTIC FUNCTION FOR A* ---
-        # This function calculates the straight-line distance between two nodes
-        def euclidean_dist_heuristic(u, v):
-            # Get the coordinates for the two nodes
-            u_coords = (G.nodes[u]['y'], G.nodes[u]['x'])
-            v_coords = (G.nodes[v]['y'], G.nodes[v]['x'])
-            # Calculate the Euclidean distance
-            return math.dist(u_coords, v_coords)
-        
-        tags = {"amenity": "pharmacy"}
-        pharmacies_gdf = ox.features_from_point(user_point, tags, dist=25000)
-        pharmacies_gdf = pharmacies_gdf[pharmacies_gdf.geom_type == 'Point']
-        if pharmacies_gdf.empty:
-            return JsonResponse({'pharmacies': []}) 
-        
-        user_node = ox.nearest_nodes(G, user_point[1], user_point[0])
-        pharmacy_nodes = ox.nearest_nodes(G, pharmacies_gdf['geometry'].x, pharmacies_gdf['geometry'].y)
-
-        results = []
-        for i, node in enumerate(pharmacy_nodes):
-            try:
-                # --- 3. USE A* ALGORITHM INSTEAD OF DIJKSTRA ---
-                # We call astar_path_length and pass our heuristic function
-                distance = nx.astar_path_length(
-                    G, 
-                    source=user_node, 
-                    target=node, 
-                    heuristic=euclidean_dist_heuristic, 
-                    weight='length'
-                )
-                
-                pharmacy_name = pharmacies_gdf.iloc[i]['name']
-                if pharmacy_name and not isinstance(pharmacy_name, float):
-                    results.append({
-                        'name': pharmacy_name,
-                        'vicinity': f"{distance:.0f} meters away"
-                    })
-            except (nx.NetworkXNoPath, KeyError):
-                continue
-        
-        sorted_results = sorted(results, key=lambda p: float(p['vicinity'].split()[0]))
-        return JsonResponse({'pharmacies': sorted_results[:5]})
-
-    except Exception as e:
-    # This will print the real, detailed error to your terminal
-        print("--- DETAILED ERROR IN API ---")
-        import traceback
-        traceback.print_exc() # This prints the full traceback
-        print("-----------------------------")
-        return JsonResponse({'error': f"An error occurred: {str(e)}"}, status=500)
\ No newline at end of file
+    from . import pharmacy_routing
+    return pharmacy_routing.find_pharmacies_api(request)
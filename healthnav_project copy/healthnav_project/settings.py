@@ -70,6 +70,31 @@ TEMPLATES = [
 WSGI_APPLICATION = 'healthnav_project.wsgi.application'
 
 
+# Pharmacy finder tile cache
+# Road graphs are cached per TILE_SIZE_DEGREES tile and pharmacies per coarser
+# TILE_PHARMACY_SIZE_DEGREES tile (about 9 Overpass requests for the 25 km
+# pharmacy radius instead of about 100). The budgets cap each LRU by nodes +
+# edges (graphs, merged copies included) and rows (pharmacies).
+
+TILE_SIZE_DEGREES = 0.05
+TILE_PHARMACY_SIZE_DEGREES = 0.25
+TILE_GRAPH_BUDGET = 2_000_000
+TILE_PHARMACY_BUDGET = 200_000
+
+# osmnx HTTP responses live in one SQLite file instead of JSON files under
+# cache/, the same store QueueShuffle uses. Import old files with
+# `manage.py import_overpass_cache` and trim with `manage.py compact_overpass_cache`.
+
+OVERPASS_CACHE_PATH = BASE_DIR / 'osm_cache.sqlite3'
+OVERPASS_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# A* heuristic for the pharmacy finder: 'haversine' (metres), 'alt'
+# (landmarks + haversine) or 'euclidean' (the old degree-based one).
+# Can be overridden per request with ?heuristic=.
+
+ASTAR_HEURISTIC = 'haversine'
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 